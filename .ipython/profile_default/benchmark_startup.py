@@ -0,0 +1,62 @@
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+STARTUP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "startup")
+# run each startup file in one namespace with the startup directory on
+# sys.path, the way IPython does
+RUN_STARTUP = """
+import glob, os, sys, time
+start = time.perf_counter()
+ns = {{'__name__': '__main__'}}
+sys.path.insert(0, {path!r})
+for f in sorted(glob.glob(os.path.join({path!r}, '*.py'))):
+    exec(compile(open(f).read(), f, 'exec'), ns)
+print(time.perf_counter() - start)
+"""
+
+def read_args():
+    parser = argparse.ArgumentParser(description="Time how long the IPython "
+            "startup files take to run in a fresh interpreter.")
+    parser.add_argument('--repeat', type=int, default=10,
+            help='number of interpreters to time (default 10)')
+    parser.add_argument('--path', default=STARTUP_PATH,
+            help='startup directory (default %s)' % STARTUP_PATH)
+    parser.add_argument('--importtime', action='store_true',
+            help='also print the 10 slowest imports (python -X importtime)')
+    return parser.parse_args()
+
+def time_startup(path, repeat):
+    """ Seconds taken to run the startup files in `path`, once per
+    fresh interpreter. """
+    code = RUN_STARTUP.format(path=path)
+    return [float(subprocess.check_output([sys.executable, "-c", code]))
+            for _ in range(repeat)]
+
+def slowest_imports(path, n=10):
+    """ The `n` slowest imports (cumulative microseconds, module) made while
+    running the startup files in `path`. """
+    code = RUN_STARTUP.format(path=path)
+    stderr = subprocess.run([sys.executable, "-X", "importtime", "-c", code],
+            capture_output=True, text=True).stderr
+    imports = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, module = line[len("import time:"):].split("|")
+        imports.append((int(cumulative), module.strip()))
+    return sorted(imports, reverse=True)[:n]
+
+def main():
+    args = read_args()
+    times = time_startup(args.path, args.repeat)
+    print("startup files in {}: median {:.1f} ms, min {:.1f} ms over {} runs".format(
+        args.path, statistics.median(times) * 1000, min(times) * 1000, len(times)))
+    if args.importtime:
+        for cumulative, module in slowest_imports(args.path):
+            print("{:>10.1f} ms  {}".format(cumulative / 1000, module))
+
+if __name__ == "__main__":
+    main()
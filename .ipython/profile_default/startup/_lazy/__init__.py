@@ -0,0 +1,17 @@
+class LazyModule:
+    """ Stand-in for a module which is only imported on first use.
+
+    Once imported, the module replaces the stand-in in `namespace`
+    (the namespace of the startup file), so later lookups cost nothing.
+    """
+
+    def __init__(self, name, alias, namespace):
+        self._name = name
+        self._alias = alias
+        self._namespace = namespace
+
+    def __getattr__(self, attr):
+        import importlib
+        module = importlib.import_module(self._name)
+        self._namespace[self._alias] = module
+        return getattr(module, attr)
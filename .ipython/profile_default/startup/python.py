@@ -1,3 +1,8 @@
+# IPython puts this directory on sys.path while running startup files
+from _lazy import LazyModule
+
+pd = LazyModule('pandas', 'pd', globals())
+
 def pyread(path):
     d = pd.read_csv(path, header='infer', sep=None, engine='python')
     print(d.head())
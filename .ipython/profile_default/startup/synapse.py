@@ -1,9 +1,25 @@
-import synapseclient as sc
-import pandas as pd
+# IPython puts this directory on sys.path while running startup files.
+# Neither synapseclient nor pandas are imported until they are used.
+from _lazy import LazyModule
+pd = LazyModule('pandas', 'pd', globals())
+sc = LazyModule('synapseclient', 'sc', globals())
 
 SANDBOX = 'syn11611056' # where to stash file views
+_viewColumnsCache = {} # (viewType, scope) -> default view columns
+LOCAL_TTL = 600 # seconds to answer queries from a local copy of a table
+# tables a query reads from, e.g. "from syn123" or "join syn456"
+TABLE_REF = r"\b(?:from|join)\s+(syn\d+)\b"
+# Synapse SQL which can't be answered from a local copy
+SERVER_ONLY = r"\b(ROW_ID|ROW_VERSION|ROW_ETAG|HAS|HAS_LIKE|CURRENT_USER)\b"
+# queries whose results Synapse doesn't index by row
+AGGREGATE = r"^\s*select\s+distinct\b|\bgroup\s+by\b|\b(count|sum|avg|min|max)\s*\("
+ROW_LABEL = "_row_label" # column holding the row index of a local copy
+# record of downloaded entities, see synapse/synapseCache.py
+ENTITY_INDEX = ".entityIndex"
+_localTables = {} # Synapse ID -> (time fetched, pandas.DataFrame)
 
-def synread(query=None, syn_=None, silent=False, **kwargs):
+def synread(query=None, syn_=None, silent=False, local=True, refresh=False,
+        **kwargs):
     """ Instantly read a variety of Synapse objects as a pandas DataFrame.
 
     Parameters
@@ -15,9 +31,18 @@ def synread(query=None, syn_=None, silent=False, **kwargs):
     syn_ : synapseclient.Synapse
         If there is a variable named `syn` in your global namespace,
         then `synread` will assume it is a Synapse object it can use
-        to interact with Synapse.
+        to interact with Synapse. Otherwise logs in with your cached
+        credentials and stores the session as `syn`.
     silent : bool
         Whether to print output to the console.
+    local : bool
+        Whether to answer `select` queries from a local copy of the
+        table or view using DuckDB (if it is installed). Queries which use
+        Synapse-only features, or which DuckDB can't run, go to Synapse.
+        Local copies are fetched again after LOCAL_TTL seconds (pass
+        `refresh=True` to see changes made since).
+    refresh : bool
+        Whether to fetch a new local copy of the table or view.
     kwargs :
         Other arguments accepted by pandas.read_csv. Only applies when
         reading in .csv, .tsv, or other tabular data from a single file.
@@ -29,17 +54,16 @@ def synread(query=None, syn_=None, silent=False, **kwargs):
     -------
     pandas.DataFrame
     """
-    if 'syn' in globals() and syn_ is None: syn_ = syn
-    elif syn_ is None:
-        raise NameError("syn object not found. "
-        "Please establish a Synapse session.")
+    if syn_ is None: syn_ = _session(silent)
     if query is None:
         query = pd.io.clipboard.clipboard_get()
     if isinstance(query, str):
         if query.lower().startswith("select"):
             try:
-                q = syn_.tableQuery(query)
-                d = q.asDataFrame()
+                d = _localQuery(query, syn_, refresh) if local else None
+                if d is None:
+                    q = syn_.tableQuery(query)
+                    d = q.asDataFrame()
             except sc.exceptions.SynapseHTTPError: # is actually a Folder
                 # bit of a hack to avoid importing re
                 startIndex = query.find("from syn")
@@ -76,12 +100,23 @@ def synread(query=None, syn_=None, silent=False, **kwargs):
     return d
 
 
+def _session(silent=False):
+    """ The Synapse session named `syn`, logging in (with cached
+    credentials) the first time it is needed. """
+    if 'syn' not in globals():
+        if not silent:
+            print("Logging in to Synapse...")
+        globals()['syn'] = sc.login(silent=True)
+    return globals()['syn']
+
+
 def _synread(query, f, syn_, silent, **kwargs):
     """ Helper function. See `synread`. """
     if isinstance(f, sc.entity.File):
         if f.path is None:
             d = None
         else:
+            _recordCached(f, syn_)
             d = pd.read_csv(f.path, sep=None, engine="python", **kwargs)
     elif isinstance(f, (sc.table.EntityViewSchema, sc.table.Schema)):
         q = syn_.tableQuery("select * from %s" % query)
@@ -101,21 +136,88 @@ def _synread(query, f, syn_, silent, **kwargs):
     return d
 
 
+def _recordCached(f, syn_):
+    """ Record the entity and version of a downloaded file, so that
+    synapseCache.py can report what it evicts. """
+    import os
+    try:
+        with open(os.path.join(syn_.cache.cache_root_dir, ENTITY_INDEX), "a") as index:
+            index.write("{}\t{}\t{}\n".format(f.dataFileHandleId, f.id,
+                f.versionNumber))
+    except (AttributeError, OSError):
+        pass
+
+
+def _localQuery(query, syn_, refresh=False):
+    """ Run `query` with DuckDB against local copies of the tables it uses.
+
+    Tables are those named in FROM and JOIN clauses (other Synapse IDs,
+    like `parentId = 'syn123'`, are values). A local copy is fetched again
+    after LOCAL_TTL seconds. Results are indexed by ROW_ID_ROW_VERSION
+    like those from Synapse.
+
+    Returns None if DuckDB isn't installed, or the query must (or failed
+    locally and should) be sent to Synapse instead.
+    """
+    import re
+    import time
+    try:
+        import duckdb
+    except ImportError:
+        return None
+    if re.search(SERVER_ONLY, query, re.IGNORECASE):
+        return None
+    tables = set(t.lower() for t in re.findall(TABLE_REF, query, re.IGNORECASE))
+    if not tables:
+        return None
+    # rows are only labeled if Synapse would label them too
+    labeled = len(tables) == 1 and not re.search(AGGREGATE, query, re.IGNORECASE)
+    con = duckdb.connect()
+    try:
+        for t in tables:
+            fetched = _localTables.get(t)
+            if refresh or fetched is None or \
+                    time.time() - fetched[0] > LOCAL_TTL:
+                d = syn_.tableQuery("select * from {}".format(t)).asDataFrame()
+                d = d.assign(**{ROW_LABEL: d.index.astype(str)})
+                fetched = _localTables[t] = (time.time(), d)
+            con.register(t, fetched[1])
+        if labeled:
+            query = re.sub(r"^\s*select\s+", "select {}, ".format(ROW_LABEL),
+                    query, count=1, flags=re.IGNORECASE)
+        d = con.execute(query).df()
+    except (duckdb.Error, sc.exceptions.SynapseError):
+        return None
+    finally:
+        con.close()
+    if labeled: # the label is first
+        d.index = d.iloc[:,0].values
+    # and again (renamed by DuckDB if labeled) if the query selects *
+    return d.loc[:,~d.columns.str.startswith(ROW_LABEL)]
+
+
 def _createEntityView(scope, syn_, silent):
-    import json
     name = "+".join(scope)
     if not silent:
         print("Creating file view...")
-    params = {'scope': scope, 'viewType': 'file'}
-    cols = syn_.restPOST('/column/view/scope',
-                             json.dumps(params))['results']
-    cols = [sc.Column(**c) for c in cols]
+    cols = [sc.Column(**c) for c in _getViewColumns(scope, syn_)]
     schema = sc.EntityViewSchema(name=name, columns=cols,
             parent=SANDBOX, scopes=scope)
     schema = syn_.store(schema)
     return schema
 
 
+def _getViewColumns(scope, syn_, viewType='file'):
+    """ Default columns of a view over `scope`, cached per scope. """
+    import json
+    key = (viewType, tuple(sorted(scope)))
+    if key not in _viewColumnsCache:
+        params = {'scope': list(scope), 'viewType': viewType}
+        _viewColumnsCache[key] = syn_.restPOST('/column/view/scope',
+                json.dumps(params))['results']
+    return _viewColumnsCache[key]
+
+
 def _getCorrespondingEntityView(scope, syn_):
     preexisting = syn_.getChildren(
             SANDBOX,
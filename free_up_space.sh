@@ -1,10 +1,13 @@
+SCRIPT_DIR=$(cd "$(dirname "$0")" && pwd)
+# size to shrink the Synapse cache to, least recently used files go first
+synapseCacheBudget=${SYNAPSE_CACHE_BUDGET:-10G}
 brewClean=true
 condaClean=true
 synapseCacheClean=false
 downloadsClean=false
 
 while true; do
-    read -p "Clean Synapse Cache? " yn
+    read -p "Clean Synapse Cache down to $synapseCacheBudget? " yn
     case $yn in
         [Yy]* ) synapseCacheClean=true; break;;
         [Nn]* ) break;;
@@ -47,7 +50,7 @@ if [ $condaClean = true ]; then
     conda clean --all -y
 fi
 if [ $synapseCacheClean = true ]; then
-    rm -r ~/.synapseCache/*;
+    python "$SCRIPT_DIR/synapse/synapseCache.py" evict --budget $synapseCacheBudget
 fi
 if [ $downloadsClean = true ]; then
     rm -r ~/Downloads/*
@@ -1,27 +1,135 @@
 import argparse
+import os
 import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+CHUNKSIZE = 100000 # rows read at a time when streaming
+OUTPUT_FORMATS = ['csv', 'parquet', 'feather']
 
 def read_args():
-    parser = argparse.ArgumentParser(description="merge csv, table")
+    parser = argparse.ArgumentParser(description="merge csv, table, parquet")
     parser.add_argument('outputFile', help='name of output')
-    parser.add_argument('filetype', help='csv, table, etc')
+    parser.add_argument('filetype', help='csv, table, parquet. '
+            '.gz and .bz2 files are decompressed, .parquet files are '
+            'always read as parquet.')
     parser.add_argument('files', nargs='+')
+    parser.add_argument('--stream', action='store_true',
+            help='merge in chunks without holding the inputs in memory')
+    parser.add_argument('--chunksize', type=int, default=CHUNKSIZE,
+            help='rows to read at a time when streaming (default %d)' % CHUNKSIZE)
+    parser.add_argument('--format', choices=OUTPUT_FORMATS,
+            help='output format (defaults to the extension of outputFile, '
+            'or csv)')
+    parser.add_argument('--source-column',
+            help='name of a column to record the file each row came from')
+    parser.add_argument('--processes', type=int,
+            help='number of processes to parse files with '
+            '(defaults to number of CPUs)')
     args = parser.parse_args()
-    return args.outputFile, args.filetype, args.files
+    return args
 
-def merge_files(filetype, files):
-    if filetype == "csv":
-        dfs = [pd.read_csv(f, header=0) for f in files]
+def _reader(filetype, f=None):
+    if filetype == "parquet" or (f is not None and f.endswith(".parquet")):
+        return pd.read_parquet
+    elif filetype == "csv":
+        return partial(pd.read_csv, header=0)
     elif filetype == "table":
-        dfs = [pd.read_table(f, header=0) for f in files]
+        return partial(pd.read_table, header=0)
     else:
         raise ValueError("Unrecognized file type: %s" % filetype)
-    return pd.DataFrame().append(dfs).reset_index(drop=True)
+
+def output_format(output_file, fmt=None):
+    """ Output format given explicitly or by the extension of `output_file`. """
+    if fmt is None:
+        ext = os.path.splitext(output_file)[1].lstrip('.')
+        fmt = ext if ext in OUTPUT_FORMATS else 'csv'
+    if fmt not in OUTPUT_FORMATS:
+        raise ValueError("Unrecognized output format: %s" % fmt)
+    return fmt
+
+def _check_source_column(source_column, columns, f):
+    if source_column in columns:
+        raise ValueError("Source column %s is already a column of %s"
+                % (source_column, f))
+
+def read_file(filetype, f, source_column=None):
+    df = _reader(filetype, f)(f)
+    if source_column:
+        _check_source_column(source_column, df.columns, f)
+        df[source_column] = f
+    return df
+
+def merge_files(filetype, files, source_column=None, processes=None):
+    """ Read `files` across `processes` processes and concatenate them
+    in the order given. """
+    read = partial(read_file, filetype, source_column=source_column)
+    if processes == 1 or len(files) == 1:
+        dfs = list(map(read, files))
+    else:
+        with ProcessPoolExecutor(max_workers=processes) as executor:
+            dfs = list(executor.map(read, files))
+    merged = pd.concat(dfs, sort=False).reset_index(drop=True)
+    if source_column: # keep the source column last
+        merged = merged[[c for c in merged.columns if c != source_column]
+                + [source_column]]
+    return merged
+
+def write_merged(df, output_file, fmt='csv'):
+    if fmt == 'csv':
+        df.to_csv(output_file, index=False)
+    elif fmt == 'parquet':
+        df.to_parquet(output_file, index=False)
+    elif fmt == 'feather':
+        # uncompressed so readers can memory map the file
+        df.to_feather(output_file, compression='uncompressed')
+
+def union_columns(filetype, files):
+    """ Read only the header of each file and return the union of their
+    columns, in the order they are first seen. """
+    columns = {}
+    for f in files:
+        for c in _reader(filetype, f)(f, nrows=0).columns:
+            columns[c] = None
+    return list(columns)
+
+def stream_merge_files(filetype, files, output_file, chunksize=CHUNKSIZE,
+        source_column=None):
+    """ Merge `files` into `output_file` one chunk at a time.
+
+    Columns are aligned on the union of every file's header, so memory use
+    depends on `chunksize` rather than on the total size of the input.
+    Values are read as strings, so that a column is written the same way
+    whatever types the rest of its chunk has (e.g. 1 rather than 1.0 in a
+    chunk with missing values).
+    """
+    if filetype == "parquet" or any(f.endswith(".parquet") for f in files):
+        raise ValueError("Streaming is only supported for csv and table files")
+    columns = union_columns(filetype, files)
+    if source_column:
+        _check_source_column(source_column, columns, ", ".join(files))
+        columns.append(source_column)
+    with open(output_file, 'w', newline='') as out:
+        pd.DataFrame(columns=columns).to_csv(out, index=False)
+        for f in files:
+            for chunk in _reader(filetype, f)(f, chunksize=chunksize, dtype=str):
+                if source_column:
+                    chunk[source_column] = f
+                chunk.reindex(columns=columns).to_csv(out, index=False,
+                        header=False)
 
 def main():
-    output_file, filetype, files = read_args()
-    merged_dfs = merge_files(filetype, files)
-    merged_dfs.to_csv(output_file, index=False)
+    args = read_args()
+    fmt = output_format(args.outputFile, args.format)
+    if args.stream:
+        if fmt != 'csv':
+            raise ValueError("--stream only writes csv output")
+        stream_merge_files(args.filetype, args.files, args.outputFile,
+                args.chunksize, args.source_column)
+    else:
+        merged_dfs = merge_files(args.filetype, args.files,
+                args.source_column, args.processes)
+        write_merged(merged_dfs, args.outputFile, fmt)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,199 @@
+import pandas as pd
+from .Pipeline import Pipeline
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+class BatchPipeline:
+    """ Apply the same annotation operations to many views which share
+    one metadata. """
+
+    def __init__(self, syn, views, meta=None, metaKey=None, activeCols=[],
+            links=None, sortCols=True, threads=None):
+        """ Create a new BatchPipeline object.
+
+        The metadata is loaded once and shared by a Pipeline per view,
+        as are the indexes built on its key columns (see
+        `Pipeline.transferLinks`). Views are loaded, annotated and
+        published concurrently by a pool of `threads` threads.
+
+        Parameters
+        ----------
+        syn : synapseclient.Synapse
+            Synapse object to communicate with Synapse.org.
+        views : list
+            Synapse IDs of file views or tables (or pandas.DataFrame objects).
+        meta : str, list, or pandas.DataFrame
+            Optional. The metadata (see `Pipeline`). Defaults to `None`.
+        metaKey : str
+            Optional. If `meta` is a list, the column to join its files on.
+        activeCols : str, list, dict, or pandas.DataFrame
+            Optional. Active columns to add to every view.
+        links : dict
+            Optional. Link values to add to every view.
+        sortCols : bool
+            Optional. Whether to sort the columns lexicographically.
+            Defaults to True.
+        threads : int
+            Optional. Number of views to work on at once. Defaults to the
+            ThreadPoolExecutor default.
+        """
+        self.syn = syn
+        self._threads = threads
+        self._shared = Pipeline(syn, meta=meta, sortCols=sortCols, metaKey=metaKey)
+        self.metaConflicts = self._shared.metaConflicts
+        self.pipelines = {}
+        self.failures = {} # view -> (operation, exception)
+        def load(view):
+            p = Pipeline(syn, view, activeCols=activeCols, links=links,
+                    sortCols=sortCols)
+            p._shareMeta(self._shared)
+            return p
+        self._map("load", load, views)
+
+    def _name(self, view):
+        return view if isinstance(view, str) else "view {}".format(id(view))
+
+    def _map(self, op, func, views):
+        """ Call `func` on each of `views` in the thread pool, printing
+        progress as each finishes.
+
+        A view whose call raises is moved from `self.pipelines` to
+        `self.failures` and skipped by later operations, without affecting
+        the other views.
+
+        Returns
+        -------
+        A dictionary mapping the names of views which succeeded to the
+        results of `func`.
+        """
+        results = {}
+        views = list(views)
+        with ThreadPoolExecutor(max_workers=self._threads) as executor:
+            futures = {executor.submit(func, v): self._name(v) for v in views}
+            for i, future in enumerate(as_completed(futures), 1):
+                name = futures[future]
+                try:
+                    results[name] = future.result()
+                    print("[{}/{}] {}: {} done".format(i, len(views), name, op))
+                except Exception as e:
+                    self.failures[name] = (op, e)
+                    self.pipelines.pop(name, None)
+                    print("[{}/{}] {}: {} failed ({})".format(
+                        i, len(views), name, op, e))
+        if op == "load":
+            self.pipelines.update((self._name(v), results[self._name(v)])
+                    for v in views if self._name(v) in results)
+        return results
+
+    def apply(self, op, *args, **kwargs):
+        """ Call the Pipeline method `op` with `args` and `kwargs` on every view.
+
+        Returns
+        -------
+        A dictionary mapping views to the values returned by `op`.
+        """
+        pipelines = dict(self.pipelines)
+        return self._map(op, lambda name: getattr(pipelines[name], op)(
+            *args, **kwargs), pipelines)
+
+    def addDefaultValues(self, colVals):
+        """ See `Pipeline.addDefaultValues`. """
+        self.apply("addDefaultValues", colVals)
+
+    def applyRules(self, annotationRules, firstMatch=False):
+        """ See `Pipeline.applyRules`. """
+        self.apply("applyRules", annotationRules, firstMatch)
+
+    def addKeyCol(self, dataKey, metaKey, regex, corrections=None):
+        """ See `Pipeline.addKeyCol`. `dataKey`, `metaKey` and `regex` are
+        required, since the key can't be chosen interactively for many
+        views at once. """
+        self.apply("addKeyCol", dataKey, metaKey, regex, corrections)
+
+    def addLinks(self, links, append=True):
+        """ See `Pipeline.addLinks`. `links` is required. """
+        self.apply("addLinks", links, append=append)
+
+    def transferLinks(self, cols=None, on=None, how='left', dropOn=True):
+        """ See `Pipeline.transferLinks`. """
+        self.apply("transferLinks", cols, on, how, dropOn)
+
+    def inferValues(self, col, referenceCols):
+        """ See `Pipeline.inferValues`. """
+        self.apply("inferValues", col, referenceCols)
+
+    def substituteColumnValues(self, col, mod):
+        """ See `Pipeline.substituteColumnValues`. """
+        self.apply("substituteColumnValues", col, mod)
+
+    def addValidationRules(self, rules):
+        """ See `Pipeline.addValidationRules`. """
+        self.apply("addValidationRules", rules)
+
+    def undo(self):
+        """ Undo the last operation on every view. """
+        self.apply("undo")
+
+    def publish(self, validate=True, resize=True, force=False):
+        """ Store every view back to Synapse, concurrently.
+
+        Parameters
+        ----------
+        validate : bool
+            Optional. Whether to check each view for possible errors
+            (see `Pipeline.validate`) first. Defaults to True.
+        resize : bool
+            Optional. Whether to fit the schemas to the views
+            (see `Pipeline.publish`). Defaults to True.
+        force : bool
+            Optional. Whether to publish views with validation warnings.
+            Rather than asking for confirmation once per view, views with
+            warnings are not published unless `force` is True. Defaults
+            to False.
+
+        Returns
+        -------
+        A dictionary mapping each published view to its Synapse ID.
+        """
+        pipelines = dict(self.pipelines)
+        # views with the 'arrow' backend are validated and stored in full
+        views = self._map("prepare",
+                lambda name: pipelines[name]._publishedView(), pipelines)
+        pipelines = {name: p for name, p in pipelines.items() if name in views}
+        plans = {name: [] for name in pipelines}
+        if resize:
+            plans = self._map("resize", lambda name: pipelines[name]._planResize(
+                views[name]), pipelines)
+            pipelines = {name: p for name, p in pipelines.items() if name in plans}
+        if validate:
+            warnings = self._map("validate", lambda name: pipelines[name]._validate(
+                views[name], plans[name]), pipelines)
+            pipelines = {name: p for name, p in pipelines.items() if name in warnings}
+            for name, w in warnings.items():
+                if len(w):
+                    print("\n{}:".format(name))
+                    for message in w:
+                        print(message)
+                    if not force:
+                        pipelines.pop(name)
+            skipped = len(self.pipelines) - len(pipelines)
+            if skipped:
+                print("\nSkipping {} views with warnings "
+                      "(publish with force=True to store them anyways).\n".format(skipped))
+        def store(name):
+            if plans[name]:
+                pipelines[name]._resizeSchema(views[name], plans[name])
+            return pipelines[name]._store(views[name])
+        return self._map("publish", store, pipelines)
+
+    def status(self):
+        """ A pandas.DataFrame with the shape of each view, or the operation
+        it failed on and why. """
+        rows = [(name, p.view.shape[0], p.view.shape[1], None, None)
+                for name, p in self.pipelines.items()]
+        rows += [(name, None, None, op, repr(e))
+                for name, (op, e) in self.failures.items()]
+        return pd.DataFrame(rows, columns=['view', 'rows', 'columns',
+            'failedOp', 'error']).set_index('view')
+
+    def __getitem__(self, view):
+        return self.pipelines[view]
@@ -2,16 +2,30 @@ import pandas as pd
 import synapseclient as sc
 import readline
 import json
+import os
 from . import utils
+from . import validation
+from . import linking
+from . import profiling
+from . import frames
+from . import fileformats
+from . import matching
+from . import rules
+import tempfile
 from copy import deepcopy
+from concurrent.futures import ThreadPoolExecutor
 
 class Pipeline:
     """ Annotations pipeline object. """
 
     BACKUP_LENGTH = 50
+    # journaled operations whose result for a row depends on other rows
+    NONLOCAL_OPS = ['inferValues']
 
     def __init__(self, syn, view=None, meta=None, activeCols=[],
-            metaActiveCols=[], links=None, sortCols=True):
+            metaActiveCols=[], links=None, sortCols=True, background=False,
+            metaKey=None, backend='pandas', chunkPath=None,
+            sampleSize=frames.CHUNKSIZE):
         """ Create a new Pipeline object.
 
         Parameters
@@ -24,8 +38,8 @@ class Pipeline:
         meta : str, list, or pandas.DataFrame
             Optional. The "metadata". If a str, can be the Synapse ID of
             a file view, table, or other delimited file. If a list, will
-            concatenate the results of each utils.synread by column.
-            Defaults to `None`.
+            join the results of each utils.synread on `metaKey` (see
+            utils.combineSynapseTabulars). Defaults to `None`.
         activeCols : str, list, dict, or pandas.DataFrame
             Optional. Active columns to add. (See `self.addActiveColumns`).
             Defaults to the empty list.
@@ -38,27 +52,156 @@ class Pipeline:
         sortCols : bool
             Optional. Whether to sort the columns lexicographically in
             `view` and/or `meta`. Defaults to True.
+        background : bool
+            Optional. Whether to return as soon as `view` is loaded and
+            finish loading `meta` in the background. The first use of the
+            metadata waits for it to finish. Defaults to False.
+        metaKey : str
+            Optional. If `meta` is a list, the column to join its files on.
+            Defaults to the first column every file has. Values which
+            conflict between the files are kept in `self.metaConflicts`.
+        backend : str
+            Optional. One of frames.BACKENDS. With 'arrow', `view` (which
+            may also be a frames.ChunkedView) is kept on disk and memory
+            mapped as `self.chunked`, and `self.view` holds its first
+            `sampleSize` rows. Operations on `self.view` are applied to
+            all of `self.chunked`, a batch at a time, when publishing
+            (see `self.applyChunked`). Defaults to 'pandas'.
+        chunkPath : str
+            Optional. Where to store `self.chunked`. Defaults to a
+            temporary file.
+        sampleSize : int
+            Optional. Rows of `self.chunked` to work on interactively.
+            Defaults to frames.CHUNKSIZE.
+
+        `view` and `meta` are loaded from Synapse concurrently.
         """
+        if backend not in frames.BACKENDS:
+            raise ValueError("backend must be one of {}".format(
+                ", ".join(frames.BACKENDS)))
         self.syn = syn
-        self.view = view if view is None else self._parseView(view, sortCols)
+        self.metaConflicts = None
+        self._metaIndexes = {} # see `self._metaIndex`
+        self._metaFuture = None
+        self._metaFrame = None
+        executor = None
+        if isinstance(meta, (str, list)):
+            executor = ThreadPoolExecutor(max_workers=1)
+            self._metaFuture = executor.submit(self._parseView, meta,
+                    sortCols, isMeta=True, key=metaKey)
+        elif meta is not None:
+            self._meta = self._parseView(meta, sortCols, isMeta=True)
         self._schema = self.syn.get(view) if isinstance(view,str) else None
+        self.chunked = None
+        if backend == 'arrow' and view is not None:
+            self.chunked = self._chunkView(view, chunkPath)
+            view = self.chunked.head(sampleSize)
+        self.view = view if view is None else self._parseView(view, sortCols,
+                entity=self._schema)
         self._index = self.view.index if isinstance(
                 self.view, pd.DataFrame) else None
         self._activeCols = []
         if activeCols: self.addActiveCols(activeCols, backup=False)
-        self._meta = meta if meta is None else self._parseView(meta, sortCols, isMeta=True)
+        if executor is not None:
+            executor.shutdown(wait=not background)
+            if not background: self._meta # raise any error loading `meta` now
         self._metaActiveCols = []
         if metaActiveCols: self.addActiveCols(metaActiveCols, isMeta=True, backup=False)
         self._sortCols = sortCols
         self.keyCol = None
         self.links = links if isinstance(links, dict) else None
+        self.validationRules = {}
+        self.journal = []
+        self._profiles = {} # cached column profiles, see `self.profile`
         self._backup = []
 
+    @property
+    def _meta(self):
+        """ The metadata, waiting for it to finish loading if need be. """
+        if self._metaFuture is not None:
+            future, self._metaFuture = self._metaFuture, None
+            self._metaFrame = future.result()
+        return self._metaFrame
+
+    @_meta.setter
+    def _meta(self, meta):
+        self._metaFuture = None
+        self._metaFrame = meta
+        self._metaIndexes = {}
+
+    def _metaIndex(self, on):
+        """ Index of the values of `on` in `self._meta` as strings.
+
+        Built once per column and kept (along with its hash table) for as
+        long as `self._meta` is, so matching many views against the same
+        metadata only hashes the metadata once.
+        """
+        if on not in self._metaIndexes:
+            self._metaIndexes[on] = pd.Index(self._meta[on].astype(str))
+        return self._metaIndexes[on]
+
+    def _shareMeta(self, other):
+        """ Use the metadata (and its indexes) of the Pipeline `other`. """
+        self._meta = other._meta
+        self._metaIndexes = other._metaIndexes
+
+    def _chunkView(self, view, path=None):
+        """ Turn `view` into a frames.ChunkedView stored at `path`. """
+        if isinstance(view, frames.ChunkedView):
+            return view
+        path = path or self._tempPath()
+        if isinstance(view, str):
+            return utils.synreadChunked(self.syn, view, path, entity=self._schema)
+        elif isinstance(view, pd.DataFrame):
+            return frames.ChunkedView.fromFrame(view, path)
+        raise TypeError("{} is not a supported data input type".format(type(view)))
+
+    @staticmethod
+    def _tempPath():
+        fd, path = tempfile.mkstemp(suffix=".arrow")
+        os.close(fd)
+        return path
+
+    def applyChunked(self, path=None, threads=None):
+        """ Apply `self.journal` to every batch of `self.chunked`.
+
+        Parameters
+        ----------
+        path : str
+            Optional. Where to store the result. Defaults to a temporary file.
+        threads : int
+            Optional. Number of batches to work on at once. Defaults to the
+            number of CPUs.
+
+        Returns
+        -------
+        A frames.ChunkedView
+
+        Raises
+        ------
+        ValueError if the journal has operations which depend on other rows
+        (`self.NONLOCAL_OPS`), since each batch only sees its own rows.
+        """
+        if self.chunked is None:
+            raise RuntimeError("No chunked view set (see `backend`).")
+        nonlocalOps = [e['op'] for e in self.journal if e['op'] in self.NONLOCAL_OPS]
+        if nonlocalOps:
+            raise ValueError("{} can't be applied one batch at a time.".format(
+                ", ".join(sorted(set(nonlocalOps)))))
+        def apply(batch):
+            if self._sortCols:
+                batch = batch.sort_index(axis=1)
+            return self._replayJournal(batch, self.journal).view
+        return self.chunked.mapBatches(apply, path or self._tempPath(), threads)
+
     def backup(self, message):
         """ Backup the state of `self` and store in `self._backup` """
-        self._backup.append((Pipeline(
-            self.syn, self.view, self._meta, self._activeCols, self._metaActiveCols,
-            self.links, self._sortCols), message))
+        # the metadata is never modified, so it's shared rather than copied
+        backup = Pipeline(self.syn, self.view, None, self._activeCols,
+                self._metaActiveCols, self.links, self._sortCols)
+        backup._shareMeta(self)
+        backup.journal = list(self.journal)
+        self._backup.append((backup, message))
         if len(self._backup) > self.BACKUP_LENGTH:
             self._backup = self._backup[1:]
 
@@ -69,10 +212,137 @@ class Pipeline:
             self.syn = backup.syn
             self.view = backup.view
             self._activeCols = backup._activeCols
+            self.journal = backup.journal
+            self._touch()
             print("Undo: {}".format(message))
         else:
             print("At last available change.")
 
+    def save(self, path):
+        """ Save this session to the directory `path`.
+
+        `self.view` and `self._meta` are written as Arrow IPC (Feather) files
+        and the rest of the session to `manifest.json`. Each backup only stores
+        the columns of its view which differ from the state after it.
+
+        Parameters
+        ----------
+        path : str
+            Directory to save to. Created if it doesn't exist.
+        """
+        import pyarrow.feather as feather
+        os.makedirs(path, exist_ok=True)
+        def writeFrame(df, name):
+            if df is None:
+                return None
+            feather.write_feather(df, os.path.join(path, name),
+                    compression='uncompressed')
+            return name
+        manifest = self._sessionState()
+        manifest['view'] = writeFrame(self.view, 'view.arrow')
+        manifest['meta'] = writeFrame(self._meta, 'meta.arrow')
+        manifest['schemaId'] = None if self._schema is None else self._schema.id
+        manifest['backups'] = []
+        after = self.view
+        # walk backwards, storing each backup relative to the state after it
+        for i in reversed(range(len(self._backup))):
+            backup, message = self._backup[i]
+            state = backup._sessionState()
+            state['message'] = message
+            state['columns'], state['full'], delta = self._viewDelta(
+                    backup.view, after)
+            state['delta'] = writeFrame(delta, 'backup{}.arrow'.format(i))
+            manifest['backups'].insert(0, state)
+            after = backup.view
+        with open(os.path.join(path, 'manifest.json'), 'w') as f:
+            json.dump(manifest, f, indent=2, default=str)
+
+    @classmethod
+    def load(cls, path, syn):
+        """ Load a session saved with `Pipeline.save`.
+
+        Frames are memory mapped rather than read into memory up front.
+
+        Parameters
+        ----------
+        path : str
+            Directory the session was saved to.
+        syn : synapseclient.Synapse
+            Synapse object to communicate with Synapse.org.
+
+        Returns
+        -------
+        A Pipeline object.
+        """
+        import pyarrow.feather as feather
+        def readFrame(name):
+            if name is None:
+                return None
+            return feather.read_table(os.path.join(path, name),
+                    memory_map=True).to_pandas()
+        with open(os.path.join(path, 'manifest.json')) as f:
+            manifest = json.load(f)
+        p = cls._fromSessionState(syn, manifest, readFrame(manifest['view']))
+        p._meta = readFrame(manifest['meta'])
+        if manifest['schemaId'] is not None:
+            p._schema = syn.get(manifest['schemaId'], downloadFile=False)
+        after = p.view
+        for state in reversed(manifest['backups']):
+            delta = readFrame(state['delta'])
+            if state['full']:
+                view = delta
+            elif after is None or state['columns'] is None:
+                view = None
+            else:
+                view = after.reindex(columns=state['columns'])
+                for c in delta.columns:
+                    view[c] = delta[c]
+            backup = cls._fromSessionState(syn, state, view)
+            backup._meta = p._meta
+            p._backup.insert(0, (backup, state['message']))
+            after = view
+        return p
+
+    def _sessionState(self):
+        """ The JSON serializable parts of this session. """
+        return {'activeCols': list(self._activeCols),
+                'metaActiveCols': list(self._metaActiveCols),
+                'links': self.links, 'keyCol': self.keyCol,
+                'sortCols': self._sortCols,
+                'validationRules': self.validationRules,
+                'journal': self.journal}
+
+    @classmethod
+    def _fromSessionState(cls, syn, state, view):
+        """ Rebuild a Pipeline from `view` and `self._sessionState()`. """
+        p = cls(syn, sortCols=state['sortCols'])
+        p.view = view
+        p._index = None if view is None else view.index
+        p._activeCols = state['activeCols']
+        p._metaActiveCols = state['metaActiveCols']
+        p.links = state['links']
+        p.keyCol = state['keyCol']
+        p.validationRules = state['validationRules']
+        p.journal = state.get('journal', [])
+        return p
+
+    @staticmethod
+    def _viewDelta(view, after):
+        """ Columns of `view` which differ from `after`.
+
+        Returns
+        -------
+        A tuple of (columns of `view`, whether the delta is all of `view`,
+        the delta as a pandas.DataFrame).
+        """
+        if view is None:
+            return None, False, None
+        if after is None or not view.index.equals(after.index):
+            return list(view.columns), True, view
+        changed = [c for c in view.columns
+                if c not in after.columns or not view[c].equals(after[c])]
+        return list(view.columns), False, view[changed]
+
     def head(self):
         """ Print head of `self.view` """
         if hasattr(self.view, 'head'):
@@ -221,8 +491,44 @@ class Pipeline:
         if backup: self.backup("addDefaultValues")
         for k in colVals:
             self.view[k] = colVals[k]
+        self._record("addDefaultValues", colVals=dict(colVals))
+        self._touch(*colVals)
+
+    def applyRules(self, annotationRules, firstMatch=False, backup=True):
+        """ Set values in `self.view` where conditions on its columns hold.
+
+        Parameters
+        ----------
+        annotationRules : list
+            Ordered (predicate, column, value) rules, e.g.
+            ({'name': {'regex': r'\.fastq'}, 'parentId': ['syn1', 'syn2']},
+            'assay', 'RNAseq') (see `rules.applyRules`).
+        firstMatch : bool
+            Optional. Whether earlier rules for a column take precedence
+            over later ones. Defaults to False (later rules win).
+        backup : bool
+            Optional. Whether to save the state of `self` before updating
+            column values. Defaults to True.
 
-    def addKeyCol(self):
+        Returns
+        -------
+        A pandas.DataFrame with the number of rows each rule matched and set.
+        """
+        if self.view is None:
+            print("No data view set.")
+            return
+        annotationRules = [rules.parseRule(r) for r in annotationRules]
+        if backup: self.backup("applyRules")
+        self.view, report = rules.applyRules(self.view, annotationRules, firstMatch)
+        for r in report.itertuples():
+            print("Rule {}: {} = {!r} matched {} rows, set {}".format(
+                r.Index + 1, r.column, r.value, r.matched, r.applied))
+        self._record("applyRules", annotationRules=annotationRules,
+                firstMatch=firstMatch)
+        self._touch(*report['column'].unique())
+        return report
+
+    def addKeyCol(self, dataKey=None, metaKey=None, regex=None, corrections=None):
         """ Add a key column to `self.view`.
 
         A key column is a column in `self.view` whose values can be matched in a
@@ -231,11 +537,48 @@ class Pipeline:
         in `self.view`. After a regular expression which satisfies the users
         requirements is found, the key column is automatically added to `self.view`
         with the same name as the column matched upon in `self._meta`.
+
+        Parameters
+        ----------
+        dataKey : str
+            Optional. Column in `self.view` to apply `regex` to.
+        metaKey : str
+            Optional. Column in `self._meta` to match on.
+        regex : str
+            Optional. Regular expression with a capture group.
+        corrections : dict
+            Optional. Substitutions to make in the extracted keys, e.g.
+            near-misses of metadata keys (see `self.suggestKeyCorrections`).
+
+        If any of `dataKey`, `metaKey` or `regex` are not set, the user is
+        asked to choose them interactively, and to review suggested
+        corrections for keys which aren't in the metadata.
         """
         if self.view is None or self._meta is None:
             print("No data view set.")
             return
         self.backup("addKeyCol")
+        if dataKey is None or metaKey is None or regex is None:
+            dataKey, metaKey, regex, newCol, corrections = self._chooseKeyCol()
+        else:
+            newCol = utils.makeColFromRegex(self.view[dataKey].values, regex)
+            if corrections:
+                newCol = utils.substituteColumnValues(newCol, corrections)
+        self.keyCol = metaKey
+        self.view[metaKey] = newCol
+        self._record("addKeyCol", dataKey=dataKey, metaKey=metaKey, regex=regex,
+                corrections=dict(corrections or {}))
+        self._touch(metaKey)
+
+    def _chooseKeyCol(self):
+        """ Interactively choose a data column, metadata column and regular
+        expression for `self.addKeyCol`.
+
+        Returns
+        -------
+        A tuple of (data column, metadata column, regex, resulting key column,
+        accepted corrections).
+        """
         link = self._linkCols(1)
         dataKey, metaKey = link.popitem()
         regex = ''
@@ -250,14 +593,24 @@ class Pipeline:
         while True:
             regex = self._inputDefault("regex: ", regex)
             newCol = utils.makeColFromRegex(self.view[dataKey].values, regex)
-            missingVals = [not v in self._meta[metaKey].values.astype(str) for v in newCol]
-            if any(missingVals):
-                before_regex = self.view[dataKey][missingVals]
-                after_regex = [newCol[i] for i in range(len(newCol)) if missingVals[i]]
+            missingVals = self._missingKeys(newCol, metaKey)
+            corrections = {}
+            if missingVals.any():
+                before_regex = self.view[dataKey].values[missingVals]
+                after_regex = pd.Series(newCol).values[missingVals]
                 print("The following values were not found in the metadata:")
                 for i in range(len(before_regex)):
                     print(after_regex[i], "<-", before_regex[i])
                 print()
+                corrections = self._reviewCorrections(
+                        self.suggestKeyCorrections(after_regex, metaKey, top=1))
+                if corrections:
+                    newCol = utils.substituteColumnValues(newCol, corrections)
+                    missingVals = self._missingKeys(newCol, metaKey)
+                    if not missingVals.any():
+                        break
+                    print("{} values are still not found in the metadata.".format(
+                        len(pd.unique(pd.Series(newCol).values[missingVals]))))
                 proceedAnyways = self._getUserConfirmation("Proceed anyways? (y) or (n): ")
                 if proceedAnyways:
                     break
@@ -265,8 +618,79 @@ class Pipeline:
                     continue
             else:
                 break
-        self.keyCol = metaKey
-        self.view[metaKey] = newCol
+        return dataKey, metaKey, regex, newCol, corrections
+
+    def _missingKeys(self, keys, metaKey):
+        """ Boolean mask of which `keys` aren't values of `metaKey` in the metadata. """
+        return ~pd.Index(pd.Series(keys).astype(str)).isin(self._metaIndex(metaKey))
+
+    def suggestKeyCorrections(self, keys, metaKey=None, top=matching.TOP,
+            threshold=matching.THRESHOLD, processes=None):
+        """ Suggest which values of `metaKey` in the metadata were meant
+        by `keys` which aren't found in it, ranked by n-gram similarity
+        (see `matching.suggestCorrections`).
+
+        The n-gram index of the metadata column is built once and kept
+        until the metadata changes.
+
+        Parameters
+        ----------
+        keys : list-like
+            Keys to find matches for. Keys which are in the metadata are ignored.
+        metaKey : str
+            Optional. Column in `self._meta`. Defaults to `self.keyCol`.
+        top : int
+            Optional. Candidates per key. Defaults to matching.TOP.
+        threshold : float
+            Optional. Minimum similarity (0 to 1). Defaults to matching.THRESHOLD.
+        processes : int
+            Optional. Number of processes to use. Defaults to the number of CPUs.
+
+        Returns
+        -------
+        A pandas.DataFrame with columns `value`, `candidate`, `score` and
+        `rank`. `dict(zip(df.value, df.candidate))` of the accepted rows
+        can be passed as `corrections` to `self.addKeyCol`.
+        """
+        metaKey = self.keyCol if metaKey is None else metaKey
+        keys = pd.Series(keys).dropna()
+        keys = keys[self._missingKeys(keys, metaKey)]
+        indexKey = ('ngrams', metaKey)
+        if indexKey not in self._metaIndexes:
+            self._metaIndexes[indexKey] = matching.NgramIndex(self._metaIndex(metaKey))
+        return matching.suggestCorrections(keys, self._metaIndexes[indexKey],
+                top=top, threshold=threshold, processes=processes)
+
+    def _reviewCorrections(self, suggestions):
+        """ Ask the user which of `suggestions` (the best candidate per value,
+        see `self.suggestKeyCorrections`) to accept, all in one go.
+
+        Returns
+        -------
+        A dictionary of accepted corrections.
+        """
+        if not len(suggestions):
+            return {}
+        print("Closest values in the metadata:")
+        for i, (value, candidate, score) in enumerate(zip(suggestions['value'],
+                suggestions['candidate'], suggestions['score']), 1):
+            print("{:>4}. {} -> {} ({:.2f})".format(i, value, candidate, score))
+        print()
+        while True:
+            answer = input("Accept (a)ll, (n)one, or which of these "
+                    "corrections (e.g. 1,3-5): ").strip().lower()
+            if answer.startswith('a'):
+                accepted = range(len(suggestions))
+            elif answer.startswith('n') or not answer:
+                return {}
+            else:
+                try:
+                    accepted = utils.parseRanges(answer, len(suggestions))
+                except ValueError:
+                    print("Please enter 'a', 'n', or numbers from the list.")
+                    continue
+            return {suggestions['value'].iloc[i]: suggestions['candidate'].iloc[i]
+                    for i in accepted}
 
     def _inputDefault(self, prompt, prefill=''):
         """ Get input from the user from a prompt with preexisting text.
@@ -288,8 +712,10 @@ class Pipeline:
         finally:
            readline.set_startup_hook()
 
-    def addFileFormatCol(self, referenceCol='name', fileFormatColName='fileFormat'):
-        """ Add a file format column using a preprogrammed regular expression.
+    def addFileFormatCol(self, referenceCol='name', fileFormatColName='fileFormat',
+            formats=None, compressionColName=None, fallback=True):
+        """ Add a file format column classified from file extensions
+        (see `fileformats.classify`).
 
         Parameters
         ----------
@@ -297,20 +723,47 @@ class Pipeline:
             Optional. Column to parse file extension from. Defaults to 'name'.
         fileFormatColName : str
             Optional. Name of newly created column. Defaults to 'fileFormat'.
+        formats : dict or str
+            Optional. Project specific extensions and the formats they
+            denote, added to fileformats.FORMATS (None removes an
+            extension), or the path to a JSON file of them.
+        compressionColName : str
+            Optional. Name of a column to store the compression of each
+            file in (e.g. 'gzip'). Defaults to not adding one.
+        fallback : bool
+            Optional. Whether to use the last extension of files with an
+            unknown format as their format. Defaults to True.
         """
         self.backup("addFileFormatCol")
-        regex = r"\.(\w+)(?:\.gz)?$"
-        filetypeCol = utils.makeColFromRegex(self.view[referenceCol].values, regex)
-        self.view[fileFormatColName] = filetypeCol
-
-    def addLinks(self, links=None, append=True, backup=True):
+        if isinstance(formats, str):
+            with open(formats) as f:
+                formats = json.load(f)
+        fileFormats, compression = fileformats.classify(
+                self.view[referenceCol].values, formats, fallback=fallback)
+        self.view[fileFormatColName] = fileFormats
+        if compressionColName is not None:
+            self.view[compressionColName] = compression
+        self._record("addFileFormatCol", referenceCol=referenceCol,
+                fileFormatColName=fileFormatColName, formats=formats,
+                compressionColName=compressionColName, fallback=fallback)
+        self._touch(fileFormatColName, *filter(None, [compressionColName]))
+
+    def addLinks(self, links=None, append=True, backup=True, top=None,
+            threshold=0.8):
         """ Add link values to `self.links`
 
         Parameters
         ----------
         links : dict, optional
             Mappings from data columns to metadata columns to add
-            to `self.links`. Calls `self._linkCols` if not set.
+            to `self.links`. Calls `self._linkCols` if neither `links`
+            nor `top` are set.
+        top : int, optional
+            Add the `top` best links from `self.suggestLinks` instead of
+            asking for them. Each data and metadata column is linked at most once.
+        threshold : float, optional
+            Minimum estimated fraction of data values found in the metadata
+            for a suggested link. Only used with `top`. Defaults to 0.8.
 
         Returns
         -------
@@ -321,7 +774,9 @@ class Pipeline:
             return
         if backup:
             self.backup("addLinks")
-        if links is None:
+        if links is None and top:
+            links = self._topLinks(top, threshold)
+        elif links is None:
             links = self._linkCols(-1)
         if not isinstance(links, dict):
             raise TypeError("`links` must be a dictionary-like object")
@@ -332,11 +787,44 @@ class Pipeline:
                 self.links[k] = links[k]
         for k, v in links.items():
             if not k in self._activeCols:
-                self._activeCols.append(l)
+                self._activeCols.append(k)
             if not v in self._metaActiveCols:
                 self._metaActiveCols.append(v)
+        self._record("addLinks", links=dict(links), append=append)
         return self.links
 
+    def suggestLinks(self, **kwargs):
+        """ Rank pairs of data and metadata columns, including candidate keys
+        extracted from the 'name' column by regular expression, by the
+        estimated fraction of data values found in the metadata column.
+
+        Parameters
+        ----------
+        kwargs :
+            Arguments accepted by `linking.suggestLinks`.
+
+        Returns
+        -------
+        A pandas.DataFrame of suggested links, best first.
+        """
+        return linking.suggestLinks(self.view, self._meta, **kwargs)
+
+    def _topLinks(self, top, threshold):
+        """ The `top` suggested links between existing columns, with each
+        data and metadata column used at most once. """
+        suggestions = self.suggestLinks(patterns=None, threshold=threshold)
+        links, usedMeta = {}, set()
+        for s in suggestions.itertuples(index=False):
+            if len(links) >= top:
+                break
+            if s.dataCol in links or s.metaCol in usedMeta:
+                continue
+            print("{} -> {} ({:.0%} contained)".format(
+                s.dataCol, s.metaCol, s.containment))
+            links[s.dataCol] = s.metaCol
+            usedMeta.add(s.metaCol)
+        return links
+
     def isValidKeyPair(self, dataCol=None, metaCol=None):
         """ Check if two columns are compatible to join upon.
 
@@ -372,9 +860,11 @@ class Pipeline:
             Mappings from the old to new values.
         """
         self.backup("substituteColumnValues")
-        self.view.loc[:,col] = utils.substituteColumnValues(self.view[col].values)
+        self.view.loc[:,col] = utils.substituteColumnValues(self.view[col].values, mod)
+        self._record("substituteColumnValues", col=col, mod=dict(mod))
+        self._touch(col)
 
-    def _parseView(self, view, sortCols, isMeta=False):
+    def _parseView(self, view, sortCols, isMeta=False, entity=None, key=None):
         """ Turn `view` into a pandas DataFrame.
 
         Parameters
@@ -383,6 +873,10 @@ class Pipeline:
             `list` is only supported if `isMeta` is True.
         sortCols : bool
             whether to order columns lexicographically in the returned DataFrame.
+        entity : synapseclient.Entity
+            Optional. The already fetched entity, if `view` is a Synapse ID.
+        key : str
+            Optional. Column to join on, if `view` is a list.
 
         Returns
         -------
@@ -393,26 +887,40 @@ class Pipeline:
         TypeError if view is not a str, list, or pandas.DataFrame
         """
         if isinstance(view, str):
-            return utils.synread(self.syn, view, sortCols)
-        elif isinstance(view, list) and meta:
-            return utils.combineSynapseTabulars(self.syn, view)
+            return utils.synread(self.syn, view, sortCols, entity=entity)
+        elif isinstance(view, list) and isMeta:
+            view, self.metaConflicts = utils.combineSynapseTabulars(
+                    self.syn, view, key=key, sortCols=sortCols)
+            return view
         elif isinstance(view, pd.DataFrame):
             if sortCols:
-                view = view.sort_index(1)
+                view = view.sort_index(axis=1)
             return deepcopy(view)
         else:
             raise TypeError("{} is not a supported data input type".format(type(view)))
 
-    def publish(self, validate = True):
+    def publish(self, validate = True, resize = True):
         """ Store `self.view` back to the file view it was derived from on Synapse.
 
         Parameters
         ----------
         validate : bool
             Optional. Whether to warn of possible errors in `self.view`. Defaults to True.
+        resize : bool
+            Optional. Whether to fit the sizes of STRING columns in the schema
+            to `self.view` (see `self._planResize`). The view is validated
+            against the resized schema, which is only stored if publishing
+            goes ahead. Defaults to True.
+
+        With the 'arrow' backend, `self.journal` is first applied to all of
+        `self.chunked` (see `self.applyChunked`), which is then resized,
+        validated and stored a batch at a time.
         """
+        view = self._publishedView()
+        # the resized schema is only stored once the view is to be published
+        plan = self._planResize(view) if resize else []
         if validate :
-            warnings = self._validate()
+            warnings = self._validate(view, plan)
             if len(warnings):
                 for w in warnings:
                     print(w)
@@ -421,12 +929,37 @@ class Pipeline:
                 if not continueAnyways:
                     print("Publish canceled.")
                     return
-        t = sc.Table(self._schema.id, self.view)
+        if plan:
+            self._resizeSchema(view, plan)
+        return self._store(view)
+
+    def _publishedView(self):
+        """ The view `self.publish` stores: `self.view`, or with the 'arrow'
+        backend, `self.journal` applied to all of `self.chunked`. """
+        return self.view if self.chunked is None else self.applyChunked()
+
+    def _store(self, view):
+        """ Store `view` (see `self._publishedView`) to `self._schema` and
+        reload `self.view` from it. """
+        if self.chunked is None:
+            t = sc.Table(self._schema.id, self.view)
+        else:
+            csvPath = self._tempPath()[:-len(".arrow")] + ".csv"
+            view.toCsv(csvPath)
+            t = sc.Table(self._schema.id, csvPath)
         print("Storing to Synapse...")
         t_online = self.syn.store(t)
         print("Fetching new table index...")
-        self.view = utils.synread(self.syn, self._schema.id)
+        if self.chunked is None:
+            self.view = utils.synread(self.syn, self._schema.id)
+        else:
+            self.chunked = utils.synreadChunked(self.syn, self._schema.id,
+                    self._tempPath(), entity=self._schema)
+            self.view = self._parseView(self.chunked.head(len(self.view)),
+                    self._sortCols)
+            self.journal = []
         self._index = self.view.index
+        self._touch()
         print("You're good to go :~)")
         return self._schema.id
 
@@ -459,19 +992,62 @@ class Pipeline:
         """ View the file view which `self.view` derives from in a browser. """
         self.syn.onweb(self._schema.id)
 
-    def _validate(self):
-        """ Validate `self.view` before publishing to warn of possible errors.
+    def addValidationRules(self, rules):
+        """ Add rules to check `self.view` against before publishing.
 
-        Currently only checks if any active columns have any null values.
+        Parameters
+        ----------
+        rules : dict
+            Mapping from column names to rules (see `validation.validate`).
+            Rules for a column already in `self.validationRules` are updated.
         """
-        warnings = []
-        # check that no columns have null values
-        null_cols = self.view[self._activeCols].isnull().any()
-        for i in null_cols.iteritems():
-            col, hasna = i
-            if hasna:
-                warnings.append("{} has null values.".format(col))
-        return warnings
+        self.validationRules = validation.mergeRules(self.validationRules, rules)
+
+    def validate(self, sampleSize=5, view=None, columns=None):
+        """ Validate `self.view` against the schema it will be stored to,
+        `self.validationRules`, and non-null `self._activeCols`.
+
+        Parameters
+        ----------
+        sampleSize : int
+            Optional. Number of violating row indices to report per rule.
+            Defaults to 5.
+        view : pandas.DataFrame or frames.ChunkedView
+            Optional. The view to validate instead of `self.view`. A
+            ChunkedView is validated a batch at a time
+            (see `validation.validateBatches`).
+        columns : list of dict-like
+            Optional. The schema columns to validate against, e.g. those
+            `self.publish` is about to resize to. Defaults to the columns
+            of `self._schema`.
+
+        Returns
+        -------
+        A pandas.DataFrame of violation counts and sample rows per column
+        (see `validation.validate`).
+        """
+        schemaRules = {}
+        if columns is None and self._schema is not None:
+            columns = self.syn.getTableColumns(self._schema)
+        if columns is not None:
+            schemaRules = validation.rulesFromColumns(columns)
+        activeRules = {c: {'notnull': True} for c in self._activeCols}
+        rules = validation.mergeRules(schemaRules, activeRules,
+                self.validationRules)
+        view = self.view if view is None else view
+        if isinstance(view, frames.ChunkedView):
+            return validation.validateBatches(view.batches, rules, sampleSize)
+        return validation.validate(view, rules, sampleSize)
+
+    def _validate(self, view=None, plan=None):
+        """ Validate `view` (defaults to `self.view`) before publishing to
+        warn of possible errors, against the schema as resized by `plan`
+        (see `self._planResize`), if given.
+
+        See `self.validate`.
+        """
+        columns = self._plannedColumns(plan) if plan else None
+        return validation.formatWarnings(self.validate(view=view, columns=columns))
 
     def removeActiveCols(self, activeCols):
         """ Remove a column name from `self._activeCols`
@@ -498,21 +1074,67 @@ class Pipeline:
         preexisingCols : list of dict-like
             Old columns to be replaced by `newCols` (if a replacement is present).
         """
-        preexistingColNames = [c['name'] for c in preexistingCols]
-        uniqueCols = []
-        for c in newCols:
-            if c['name'] in preexistingColNames:
-                # default behavior is to replace the older column with the newer.
-                isCol = [c_['name'] == c['name'] for c_ in preexistingCols]
-                preexistingCols.pop(isCol.index(True))
-            uniqueCols.append(c)
-        uniqueCols += preexistingCols
-        return uniqueCols
+        newColNames = set(c['name'] for c in newCols)
+        # default behavior is to replace the older column with the newer.
+        return list(newCols) + [c for c in preexistingCols
+                if c['name'] not in newColNames]
+
+    def profile(self, topK=profiling.TOP_K):
+        """ Profile `self._activeCols` in `self.view` and `self._metaActiveCols`
+        in `self._meta`.
+
+        Profiles are cached, and only columns changed by an operation since
+        the last call are profiled again.
+
+        Parameters
+        ----------
+        topK : int
+            Optional. Number of most common values to report per column.
+            Defaults to profiling.TOP_K.
+
+        Returns
+        -------
+        A pandas.DataFrame indexed by ('view' or 'meta', column) with the
+        null count, distinct count, most common values and string length
+        statistics of each column (see `profiling.profileColumns`).
+        """
+        profiles = [('view', self.view, self._activeCols),
+                ('meta', self._meta, self._metaActiveCols)]
+        for source, df, cols in profiles:
+            if df is None:
+                continue
+            cols = [c for c in cols if c in df.columns]
+            stale = [c for c in cols
+                    if (source, c, topK) not in self._profiles]
+            if stale:
+                profile = profiling.profileColumns(df, stale, topK)
+                for c, stats in profile.iterrows():
+                    self._profiles[(source, c, topK)] = stats
+        keys = [(source, c) for source, df, cols in profiles
+                if df is not None for c in cols if c in df.columns]
+        return pd.DataFrame([self._profiles[k + (topK,)] for k in keys],
+                index=pd.MultiIndex.from_tuples(keys, names=['source', 'column']),
+                columns=profiling.STATS)
+
+    def _touch(self, *cols):
+        """ Forget the cached profiles of `cols` in `self.view`, or of every
+        column if `cols` isn't set. """
+        if not cols:
+            self._profiles = {}
+        else:
+            self._profiles = {k: v for k, v in self._profiles.items()
+                    if k[0] != 'view' or k[1] not in cols}
 
     def valueCounts(self):
-        """ Print the value counts of all `self._activeCols`. """
-        for c in self._activeCols:
-            print(self.view[c].value_counts(dropna=False), end="\n")
+        """ Print the most common values of all `self._activeCols` and
+        `self._metaActiveCols` (see `self.profile`). """
+        profile = self.profile()
+        for (source, c), stats in profile.iterrows():
+            print("{} ({}): {} nulls, {} distinct".format(
+                c, source, stats['nulls'], stats['distinct']))
+            for value, count in stats['top']:
+                print("    {}: {}".format(value, count))
+        print()
 
     def _prettyPrintColumns(self, cols, style):
         """ Helper function to print columns in a legible way.
@@ -567,23 +1189,27 @@ class Pipeline:
             a two-column .csv file, and then proceeds as if `addCols` was a dict,
             where the first column are the keys and the second column are the values.
 
+        Column types and sizes are inferred from `self.view` and from the
+        metadata linked to each column where possible (see `self.inferColumns`).
+
         Returns
         -------
         Synapse ID of newly created fileview.
         """
         self.backup("CreateFileView")
         if isinstance(scope, str): scope = [scope]
-        params = {'scope': scope, 'viewType': 'file'}
-        cols = self.syn.restPOST('/column/view/scope',
-                json.dumps(params))['results']
+        cols = utils.getViewColumns(self.syn, scope)
+        inferred = self.inferColumns()
         if self._activeCols:
-            activeCols = utils.makeColumns(self._activeCols, asSynapseCols=False)
+            activeCols = utils.makeColumns(self._activeCols, asSynapseCols=False,
+                    inferred=inferred)
             cols = self._getUniqueCols(activeCols, cols)
         if addCols:
             for k in addCols:
                 if addCols[k] is None and not k in self._activeCols:
                     self._activeCols.append(k)
-            newCols = utils.makeColumns(addCols, asSynapseCols=False)
+            newCols = utils.makeColumns(addCols, asSynapseCols=False,
+                    inferred=inferred)
             cols = self._getUniqueCols(newCols, cols)
         cols = [sc.Column(**c) for c in cols]
         schema = sc.EntityViewSchema(name=name, columns=cols,
@@ -591,9 +1217,93 @@ class Pipeline:
         self._schema = self.syn.store(schema)
         self.view = utils.synread(self.syn, self._schema.id)
         self._index = self.view.index
+        self._touch()
         if isinstance(addCols, dict): self.addDefaultValues(addCols, False)
         return self._schema.id
 
+    def inferColumns(self):
+        """ Infer Synapse column types and sizes from `self.view` and from
+        the metadata columns linked to it in `self.links`.
+
+        Returns
+        -------
+        A dictionary mapping column names to dictionaries with keys
+        `columnType` and (for STRING columns) `maximumSize`.
+        (See `utils.inferColumns`).
+        """
+        inferred = []
+        if self._meta is not None and self.links:
+            metaCols = [v for v in set(self.links.values()) if v in self._meta]
+            metaInferred = utils.inferColumns(self._meta[metaCols])
+            inferred.append({k: metaInferred[v] for k, v in self.links.items()
+                if v in metaInferred})
+        if isinstance(self.view, pd.DataFrame):
+            inferred.append(utils.inferColumns(self.view))
+        return utils.widestColumns(*inferred)
+
+    def _planResize(self, view=None):
+        """ Fit the STRING columns of `self._schema` to the values in `view`
+        (defaults to `self.view`; a frames.ChunkedView is read a batch at a time).
+
+        Columns too small for their values are grown (to LARGETEXT if need be)
+        and annotation columns (`self._activeCols` and the keys of `self.links`)
+        are shrunk to the smallest size bucket which holds their values.
+        Nothing is stored (see `self._resizeSchema`).
+
+        Returns
+        -------
+        A list of (current column, new column) tuples, one per column to resize.
+        """
+        view = self.view if view is None else view
+        cols = [c for c in self.syn.getTableColumns(self._schema)
+                if c['columnType'] == 'STRING' and c['name'] in view.columns]
+        names = [c['name'] for c in cols]
+        if isinstance(view, frames.ChunkedView):
+            inferred = utils.widestColumns(*(utils.inferColumns(b[names])
+                for b in view.batches()))
+        else:
+            inferred = utils.inferColumns(view[names])
+        annotationCols = set(self._activeCols).union(self.links or {})
+        plan = []
+        for c in cols:
+            new = inferred.get(c['name'])
+            if new is None or new['columnType'] not in ('STRING', 'LARGETEXT'):
+                continue
+            size = new.get('maximumSize')
+            oldSize = int(c.get('maximumSize', utils.DEFAULT_SIZE))
+            grow = size is None or size > oldSize
+            shrink = size is not None and size < oldSize and \
+                    c['name'] in annotationCols
+            if grow or shrink:
+                plan.append((c, sc.Column(name=c['name'],
+                    defaultValue=c.get('defaultValue'), **new)))
+        return plan
+
+    def _plannedColumns(self, plan):
+        """ The columns of `self._schema` after resizing by `plan`
+        (see `self._planResize`). """
+        resized = {old['name']: new for old, new in plan}
+        return [resized.get(c['name'], c)
+                for c in self.syn.getTableColumns(self._schema)]
+
+    def _resizeSchema(self, view=None, plan=None):
+        """ Store the columns of `self._schema` resized to fit `view`.
+
+        Parameters
+        ----------
+        view : pandas.DataFrame or frames.ChunkedView
+            Optional. Defaults to `self.view`.
+        plan : list
+            Optional. The resizing to store, as returned by
+            `self._planResize`. Defaults to planning it from `view`.
+        """
+        plan = self._planResize(view) if plan is None else plan
+        for old, new in plan:
+            self._schema.removeColumn(old)
+            self._schema.addColumn(self.syn.store(new))
+        if plan:
+            self._schema = self.syn.store(self._schema)
+
     def transferLinks(self, cols=None, on=None, how='left', dropOn=True):
         """ Copy metadata to `self.view`, matching on `self.keyCol`.
 
@@ -629,24 +1339,69 @@ class Pipeline:
         for c in metaCols:
             if c in self.view.columns:
                 renamedCols[c] = "{}_meta".format(c)
-        metaCols.append(on)
-        relevant_meta = self._meta.loc[:,metaCols]
-        relevant_meta.rename(columns=renamedCols, inplace=True)
         # prevent type comparison errors
-        relevant_meta[on] = relevant_meta[on].astype(str)
         self.view[on] = self.view[on].astype(str)
-        merged = self.view.merge(relevant_meta, on=on, how=how)
-        # if there are duplicates in the data this may break things
-        merged.drop_duplicates(inplace=True)
+        keys = self._metaIndex(on)
+        if how == 'left' and keys.is_unique:
+            # look up each row in the prebuilt metadata index
+            rows = keys.get_indexer(self.view[on])
+            merged = pd.DataFrame({renamedCols.get(c, c):
+                pd.api.extensions.take(self._meta[c].values, rows, allow_fill=True)
+                for c in metaCols}, index=self.view.index)
+            merged = pd.concat([self.view, merged], axis=1)
+        else:
+            metaCols.append(on)
+            relevant_meta = self._meta.loc[:,metaCols]
+            relevant_meta.rename(columns=renamedCols, inplace=True)
+            relevant_meta[on] = keys
+            merged = self.view.merge(relevant_meta, on=on, how=how)
+            # if there are duplicates in the data this may break things
+            merged.drop_duplicates(inplace=True)
         print("original", self.view.shape)
         print("merged", merged.shape)
         for c in cols:
             v = self.links[c]
             if v in renamedCols:
-                v = renamedCols[c]
+                v = renamedCols[v]
             self.view[c] = merged[v].values
         if dropOn:
-            self.view.drop(on, 1, inplace=True)
+            self.view.drop(columns=on, inplace=True)
+        self._record("transferLinks", cols=cols, on=on, how=how, dropOn=dropOn)
+        self._touch(on, *cols)
+
+    def transform(self, col, func, inputs, processes=None):
+        """ Set `col` in `self.view` to the result of calling `func` on the
+        values of `inputs` in each row.
+
+        `func` is called once per unique combination of input values,
+        across a pool of processes (see `utils.mapUnique`).
+
+        Parameters
+        ----------
+        col : str
+            Column to store the results in.
+        func : callable or str
+            Called as `func(*values)`. May also be the name of a function
+            like 'module:function'.
+        inputs : str or list
+            Column(s) of `self.view` whose values are passed to `func`.
+        processes : int
+            Optional. Number of processes to use. Defaults to the number of CPUs.
+        """
+        if self.view is None:
+            print("No data view set.")
+            return
+        self.backup("transform")
+        func = utils.resolveFunction(func)
+        self.view[col] = utils.mapUnique(self.view, func, inputs, processes)
+        name = utils.functionName(func)
+        if name is None:
+            print("{} can't be imported by name, so it won't be "
+                    "replayed (see `self.replay`).".format(func))
+        else:
+            self._record("transform", col=col, func=name, inputs=inputs,
+                    processes=processes)
+        self._touch(col)
 
     def inferValues(self, col, referenceCols):
         """ Fill in values for indices which match on `referenceCols`
@@ -664,6 +1419,62 @@ class Pipeline:
             return
         self.backup("inferValues")
         self.view = utils.inferValues(self.view, col, referenceCols)
+        self._record("inferValues", col=col, referenceCols=referenceCols)
+        self._touch(col)
+
+    def _record(self, op, **params):
+        """ Add an operation and its parameters to `self.journal`. """
+        self.journal.append({'op': op, 'params': params})
+
+    def replay(self, newView, sortCols=None):
+        """ Re-apply `self.journal` to a freshly loaded version of the view.
+
+        Rows of `newView` whose index (ROW_ID, ROW_VERSION and ROW_ETAG for
+        file views read from Synapse) also appears in `self.view` have not
+        changed upstream, and keep their values from `self.view`. The journal
+        is only replayed on new and changed rows, except for operations which
+        depend on other rows (`inferValues` and anything after it), which are
+        replayed on the whole view.
+
+        Parameters
+        ----------
+        newView : str or pandas.DataFrame
+            The refreshed view. If a str, the Synapse ID of the view.
+        sortCols : bool
+            Optional. Whether to sort the columns of `newView`
+            lexicographically. Defaults to `self._sortCols`.
+        """
+        if sortCols is None: sortCols = self._sortCols
+        newView = self._parseView(newView, sortCols)
+        self.backup("replay")
+        rowLocal = []
+        for entry in self.journal:
+            if entry['op'] in self.NONLOCAL_OPS:
+                break
+            rowLocal.append(entry)
+        unchanged = newView.index.isin(self.view.index)
+        print("Replaying {} operations on {} of {} rows".format(
+            len(rowLocal), (~unchanged).sum(), len(newView)))
+        changed = self._replayJournal(newView[~unchanged], rowLocal)
+        view = pd.concat([self.view.loc[newView.index[unchanged]], changed.view],
+                sort=False).reindex(newView.index)
+        p = self._replayJournal(view, self.journal[len(rowLocal):])
+        self.view = p.view
+        self._index = newView.index
+        self._touch()
+        self.keyCol = self.keyCol or p.keyCol
+
+    def _replayJournal(self, view, journal):
+        """ Apply `journal` to `view` in a scratch Pipeline sharing `self._meta`. """
+        p = Pipeline(self.syn, sortCols=False)
+        p.view = view.copy()
+        p._shareMeta(self)
+        p.links = deepcopy(self.links)
+        p.keyCol = self.keyCol
+        p.backup = lambda message: None # no undo history for a scratch Pipeline
+        for entry in journal:
+            getattr(p, entry['op'])(**entry['params'])
+        return p
 
     def _linkCols(self, iters):
         """ Helper function to return a dictionary with data columns as keys
@@ -1,3 +1,12 @@
-__all__ = ['Pipeline', 'utils']
+__all__ = ['Pipeline', 'BatchPipeline', 'utils', 'validation', 'linking',
+        'profiling', 'frames', 'fileformats', 'matching', 'rules']
 from annotator.Pipeline import Pipeline
+from annotator.BatchPipeline import BatchPipeline
 from annotator import utils
+from annotator import validation
+from annotator import linking
+from annotator import profiling
+from annotator import frames
+from annotator import fileformats
+from annotator import matching
+from annotator import rules
@@ -0,0 +1,112 @@
+import pandas as pd
+import numpy as np
+
+# file extensions (dot separated, lower case) and the fileFormat they denote.
+# Longer extensions take precedence, e.g. 'bam.bai' over 'bai'.
+FORMATS = {
+        'bam': 'bam', 'bai': 'bai', 'bam.bai': 'bai', 'sam': 'sam',
+        'cram': 'cram', 'crai': 'crai', 'cram.crai': 'crai',
+        'fastq': 'fastq', 'fq': 'fastq', 'fasta': 'fasta', 'fa': 'fasta',
+        'fna': 'fasta', 'vcf': 'vcf', 'bcf': 'bcf', 'tbi': 'tbi',
+        'vcf.tbi': 'tbi', 'vcf.idx': 'idx', 'gvcf': 'gvcf', 'g.vcf': 'gvcf',
+        'bed': 'bed', 'bedgraph': 'bedgraph', 'bigwig': 'bigwig', 'bw': 'bigwig',
+        'bigbed': 'bigbed', 'bb': 'bigbed', 'narrowpeak': 'narrowPeak',
+        'broadpeak': 'broadPeak', 'gtf': 'gtf', 'gff': 'gff', 'gff3': 'gff3',
+        'sra': 'sra', 'idat': 'idat', 'cel': 'cel', 'maf': 'maf', 'seg': 'seg',
+        'mtx': 'mtx', 'h5': 'hdf5', 'hdf5': 'hdf5', 'h5ad': 'h5ad',
+        'loom': 'loom', 'rds': 'rds', 'rda': 'rdata', 'rdata': 'rdata',
+        'csv': 'csv', 'tsv': 'tsv', 'txt': 'txt', 'json': 'json', 'xml': 'xml',
+        'xls': 'excel', 'xlsx': 'excel', 'pdf': 'pdf', 'html': 'html',
+        'tif': 'tiff', 'tiff': 'tiff', 'png': 'png', 'jpg': 'jpg',
+        'jpeg': 'jpg', 'svs': 'svs', 'tar': 'tar', 'md5': 'md5'}
+# compression layers, which are stripped before matching FORMATS.
+COMPRESSION = {'gz': 'gzip', 'bgz': 'gzip', 'bz2': 'bzip2', 'xz': 'xz',
+        'zip': 'zip', 'zst': 'zstd', '7z': '7z', 'tgz': 'gzip'}
+# formats of compression layers which are also archives, used when nothing
+# but compression layers is found ('tgz' is a compressed tar file)
+ARCHIVES = {'tgz': 'tar', 'zip': 'zip', '7z': '7z'}
+# the most dot separated parts of a name to look at
+MAX_PARTS = 6
+_END = None # marks the end of an extension in the trie
+
+def buildTrie(formats=FORMATS):
+    """ A trie of the extensions in `formats`, keyed by their dot separated
+    parts in reverse order (so 'bam.bai' is stored under 'bai', 'bam'). """
+    trie = {}
+    for ext, fileFormat in formats.items():
+        node = trie
+        for part in reversed(ext.lower().split('.')):
+            node = node.setdefault(part, {})
+        node[_END] = fileFormat
+    return trie
+
+def _classifySuffix(parts, trie, compression, fallback):
+    """ Classify one file name, given as its dot separated parts in reverse
+    order (without the stem). Returns a (format, compression) tuple. """
+    layers = []
+    i = 0
+    while i < len(parts) and parts[i] in compression:
+        layers.append(compression[parts[i]])
+        i += 1
+    node, fileFormat = trie, None
+    for part in parts[i:]:
+        node = node.get(part)
+        if node is None:
+            break
+        fileFormat = node.get(_END, fileFormat)
+    if fileFormat is None and layers:
+        # an archive, like .zip or .tgz, closest to the stem
+        archives = [ARCHIVES[p] for p in parts[:i] if p in ARCHIVES]
+        fileFormat = archives[-1] if archives else None
+    if fileFormat is None and fallback and i < len(parts):
+        fileFormat = parts[i]
+    return fileFormat, '.'.join(reversed(layers)) or None
+
+def classify(names, formats=None, compression=None, fallback=True):
+    """ Classify file names by their file format and compression.
+
+    Names are factorized by their last few extensions, and each distinct
+    combination of extensions is looked up once in a reversed-suffix trie
+    of `formats`, after stripping any compression layers.
+
+    Parameters
+    ----------
+    names : list-like
+        File names.
+    formats : dict
+        Optional. Extensions (like 'fastq' or 'bam.bai') and the file
+        format they denote, to add to (or, mapped to None, remove from)
+        FORMATS, e.g. project specific formats.
+    compression : dict
+        Optional. Extensions of compression layers and the compression
+        they denote. Defaults to COMPRESSION.
+    fallback : bool
+        Optional. Whether to use the last (uncompressed) extension of a
+        name as its format if it isn't a known format (or in an archive,
+        like .zip, in which case the format is the archive). Otherwise
+        unknown formats are None. Defaults to True.
+
+    Returns
+    -------
+    A tuple of two numpy arrays, (file formats, compression), with None
+    where a name has no format or isn't compressed. Names compressed more
+    than once list their compression innermost first, e.g. 'bzip2.gzip'.
+    """
+    formats = {k: v for k, v in dict(FORMATS, **(formats or {})).items()
+            if v is not None}
+    compression = COMPRESSION if compression is None else compression
+    trie = buildTrie(formats)
+    codes, uniques = pd.factorize(np.asarray(names, dtype=object))
+    # everything after the first dot of the base name, lower cased
+    # (null for names which aren't strings or have no extension)
+    suffixes = pd.Series(uniques, dtype=object).str.rpartition('/')[2] \
+            .str.partition('.')[2].str.lower()
+    sCodes, sUniques = pd.factorize(suffixes.where(suffixes != ''))
+    classified = [_classifySuffix(s.split('.')[::-1][:MAX_PARTS], trie,
+        compression, fallback) for s in sUniques]
+    fileFormats = np.array([c[0] for c in classified] + [None], dtype=object)
+    layers = np.array([c[1] for c in classified] + [None], dtype=object)
+    # -1 codes (no extension, or a null name) index the trailing None
+    sCodes = np.append(sCodes, -1)
+    rows = sCodes[codes]
+    return fileFormats[rows], layers[rows]
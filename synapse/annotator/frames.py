@@ -0,0 +1,224 @@
+import pandas as pd
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+BACKENDS = ['pandas', 'arrow']
+CHUNKSIZE = 100000 # rows per record batch
+# columns identifying a row of a Synapse table, kept out of the way as the index
+INDEX_COLS = ['ROW_ID', 'ROW_VERSION', 'ROW_ETAG']
+# column names unnamed index levels are stored under (as pandas and Arrow
+# do), which are restored as unnamed levels and never written to CSV
+UNNAMED_INDEX = "__index_level_{}__"
+
+class ChunkedView:
+    """ A view too large to hold in memory as a pandas.DataFrame.
+
+    The view is stored as an Arrow IPC (Feather) file and memory mapped,
+    so only the record batches being worked on are read into memory. Each
+    batch is handed to pandas code as a pandas.DataFrame indexed by
+    `indexCols`, so functions written for small views work on it unchanged.
+    pyarrow is only required when a ChunkedView is used.
+    """
+
+    def __init__(self, path, indexCols=INDEX_COLS):
+        """ Memory map the Arrow IPC file `path`.
+
+        Parameters
+        ----------
+        path : str
+        indexCols : list
+            Optional. Columns to use as the index of each batch, where
+            present. Defaults to INDEX_COLS.
+        """
+        import pyarrow as pa
+        self.path = path
+        self._table = pa.ipc.open_file(pa.memory_map(path)).read_all()
+        names = self._table.column_names
+        self.indexCols = [c for c in indexCols if c in names] + \
+                [c for c in names if _isUnnamed(c) and c not in indexCols]
+
+    @classmethod
+    def fromCsv(cls, csvPath, path, chunksize=CHUNKSIZE, indexCols=INDEX_COLS):
+        """ Stream the CSV file `csvPath` into a ChunkedView at `path`.
+
+        Values are read as strings (except for `indexCols`, whose types are
+        inferred), so that types don't have to agree between batches.
+        """
+        import pyarrow as pa
+        import pyarrow.csv as csv
+        with open(csvPath) as f:
+            header = pd.read_csv(f, nrows=0).columns
+        types = {c: pa.string() for c in header if c not in indexCols}
+        reader = csv.open_csv(csvPath,
+                read_options=csv.ReadOptions(block_size=1 << 24),
+                convert_options=csv.ConvertOptions(column_types=types,
+                    strings_can_be_null=True))
+        with pa.ipc.new_file(path, reader.schema) as writer:
+            for batch in reader:
+                for start in range(0, batch.num_rows, chunksize):
+                    writer.write_batch(batch.slice(start, chunksize))
+        return cls(path, indexCols)
+
+    @classmethod
+    def fromFrame(cls, df, path, chunksize=CHUNKSIZE):
+        """ Write the pandas.DataFrame `df` to a ChunkedView at `path`.
+
+        The index of `df` is kept as the index of each batch, with unnamed
+        levels stored under UNNAMED_INDEX, so row labels stay unique
+        across batches.
+        """
+        import pyarrow as pa
+        indexCols = [UNNAMED_INDEX.format(i) if name is None else name
+                for i, name in enumerate(df.index.names)]
+        table = pa.Table.from_pandas(df.rename_axis(indexCols).reset_index(),
+                preserve_index=False)
+        with pa.ipc.new_file(path, table.schema) as writer:
+            writer.write_table(table, max_chunksize=chunksize)
+        return cls(path, indexCols)
+
+    @property
+    def columns(self):
+        return pd.Index([c for c in self._table.column_names
+            if c not in self.indexCols])
+
+    @property
+    def shape(self):
+        return (self._table.num_rows, len(self.columns))
+
+    def _toPandas(self, batch):
+        df = batch.to_pandas()
+        if not self.indexCols:
+            return df
+        df = df.set_index(self.indexCols)
+        df.index.names = [None if _isUnnamed(c) else c for c in self.indexCols]
+        return df
+
+    def head(self, n=5):
+        """ The first `n` rows as a pandas.DataFrame. """
+        return self._toPandas(self._table.slice(0, n))
+
+    def toPandas(self):
+        """ Read the whole view into a pandas.DataFrame. """
+        return self._toPandas(self._table)
+
+    def batches(self, chunksize=CHUNKSIZE):
+        """ Iterate over the view as pandas.DataFrame objects of at most
+        `chunksize` rows. """
+        for batch in self._table.to_batches(max_chunksize=chunksize):
+            yield self._toPandas(batch)
+
+    def mapBatches(self, func, path, threads=None, chunksize=CHUNKSIZE):
+        """ Apply `func` to each batch, writing the results to a new
+        ChunkedView at `path`.
+
+        Batches are processed by a pool of `threads` threads (pandas and
+        Arrow release the GIL for most of their work), a window of batches
+        at a time so that only a few batches are in memory at once.
+
+        Each result is spilled to disk next to `path` as it's done, since
+        `func` may return different columns or types for different batches
+        (e.g. a column only set where a rule matched, or a column which is
+        all null in one batch). The results are then combined into one
+        schema (see `_unifySchemas`): every batch gets the columns of all
+        of them, and a column gets the one type its values have in every
+        batch, or string if they disagree.
+
+        Parameters
+        ----------
+        func : callable
+            Takes and returns a pandas.DataFrame, keeping its index.
+        path : str
+        threads : int
+            Optional. Defaults to the number of CPUs.
+
+        Returns
+        -------
+        A ChunkedView
+        """
+        import pyarrow as pa
+        batches = self._table.to_batches(max_chunksize=chunksize)
+        threads = threads or os.cpu_count() or 1
+        window = threads * 2
+        parts = []
+        def apply(batch):
+            df = func(self._toPandas(batch))
+            if self.indexCols:
+                df = df.rename_axis(self.indexCols).reset_index()
+            for c in df.columns:
+                if df[c].dtype == object and c not in self.indexCols:
+                    # mixed Python objects, which Arrow can't always convert
+                    df[c] = df[c].astype('string')
+            return pa.Table.from_pandas(df, preserve_index=False)
+        try:
+            with ThreadPoolExecutor(max_workers=threads) as executor:
+                for start in range(0, len(batches), window):
+                    for table in executor.map(apply, batches[start:start+window]):
+                        part = "{}.part{}".format(path, len(parts))
+                        with pa.ipc.new_file(part, table.schema) as writer:
+                            writer.write_table(table)
+                        parts.append(part)
+            if not parts:
+                pa.ipc.new_file(path, self._table.schema).close()
+                return ChunkedView(path, self.indexCols)
+            schemas = [pa.ipc.open_file(part).schema for part in parts]
+            schema = _unifySchemas(schemas)
+            with pa.ipc.new_file(path, schema) as writer:
+                for part in parts:
+                    table = pa.ipc.open_file(pa.memory_map(part)).read_all()
+                    columns = [table[f.name].cast(f.type)
+                            if f.name in table.column_names
+                            else pa.nulls(table.num_rows, f.type) for f in schema]
+                    writer.write_table(pa.Table.from_arrays(columns, schema=schema))
+        finally:
+            for part in parts:
+                if os.path.exists(part):
+                    os.remove(part)
+        return ChunkedView(path, self.indexCols)
+
+    def toCsv(self, path, chunksize=CHUNKSIZE):
+        """ Write the view (including its named `indexCols`) to the CSV file `path`,
+        a batch at a time. """
+        import pyarrow.csv as csv
+        table = self._table.drop_columns([c for c in self.indexCols
+            if _isUnnamed(c)])
+        with csv.CSVWriter(path, table.schema) as writer:
+            for batch in table.to_batches(max_chunksize=chunksize):
+                writer.write_batch(batch)
+
+def _isUnnamed(col):
+    """ Whether `col` is an unnamed index level (see UNNAMED_INDEX). """
+    return re.fullmatch(UNNAMED_INDEX.format(r"\d+"), col) is not None
+
+def _unifySchemas(schemas):
+    """ One schema with the fields of all of `schemas`.
+
+    Fields keep their order in each schema (so that columns sorted in
+    every schema stay sorted). A field gets its type in every schema
+    where it isn't all null: floats if its types are all numeric, strings
+    if they otherwise disagree or if it's always null.
+    """
+    import pyarrow as pa
+    order, types = [], {}
+    for schema in schemas:
+        previous = None
+        for f in schema:
+            if f.name not in types:
+                order.insert(order.index(previous) + 1 if previous is not None
+                        else 0, f.name)
+                types[f.name] = set()
+            if not pa.types.is_null(f.type):
+                types[f.name].add(f.type)
+            previous = f.name
+    fields = []
+    for name in order:
+        t = types[name]
+        if len(t) == 1:
+            t = t.pop()
+        elif t and all(pa.types.is_integer(x) or pa.types.is_floating(x)
+                or pa.types.is_boolean(x) for x in t):
+            t = pa.float64()
+        else:
+            t = pa.large_string() if pa.large_string() in t else pa.string()
+        fields.append(pa.field(name, t))
+    return pa.schema(fields)
@@ -0,0 +1,144 @@
+import pandas as pd
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+
+NUM_PERM = 128
+CHUNKSIZE = 65536
+SEED = 0
+# candidate key columns parsed from file names: the name without its
+# extensions, and its first one through six '_' delimited fields.
+NAME_PATTERNS = [r"^([^.]+)"] + [
+        r"^((?:[^_.]+_){%d}[^_.]+)" % i for i in range(6)]
+
+def _mix(x):
+    """ splitmix64 finalizer, applied elementwise to a uint64 array. """
+    with np.errstate(over='ignore'):
+        x = (x ^ (x >> np.uint64(30))) * np.uint64(0xbf58476d1ce4e5b9)
+        x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94d049bb133111eb)
+    return x ^ (x >> np.uint64(31))
+
+def sketch(values, numPerm=NUM_PERM, seed=SEED):
+    """ MinHash sketch of the distinct, non-null values of `values`.
+
+    Values are compared as strings, the same way `Pipeline.transferLinks`
+    matches keys.
+
+    Parameters
+    ----------
+    values : pandas.Series
+    numPerm : int
+        Optional. Number of hash functions. Defaults to NUM_PERM.
+    seed : int
+        Optional. Seed for the hash functions. Defaults to SEED.
+
+    Returns
+    -------
+    A tuple of (signature as a uint64 array of length `numPerm`,
+    number of distinct values).
+    """
+    uniques = pd.unique(values.dropna().astype(str))
+    hashes = pd.util.hash_array(np.asarray(uniques, dtype=object))
+    seeds = _mix(np.arange(1, numPerm + 1, dtype=np.uint64) + np.uint64(seed))
+    signature = np.full(numPerm, np.iinfo(np.uint64).max, dtype=np.uint64)
+    for start in range(0, len(hashes), CHUNKSIZE):
+        chunk = hashes[start:start+CHUNKSIZE]
+        signature = np.minimum(signature,
+                _mix(chunk[None,:] ^ seeds[:,None]).min(axis=1))
+    return signature, len(uniques)
+
+def containment(a, b):
+    """ Estimate the fraction of the values sketched in `a` which are also
+    in `b`, where `a` and `b` are results of `sketch`. """
+    (sigA, nA), (sigB, nB) = a, b
+    if not nA or not nB:
+        return 0.0
+    jaccard = np.mean(sigA == sigB)
+    return min(1.0, jaccard * (nA + nB) / ((1 + jaccard) * nA))
+
+def _sketchItem(item):
+    name, values, numPerm = item
+    return name, sketch(values, numPerm)
+
+def sketchColumns(columns, numPerm=NUM_PERM, processes=None):
+    """ Sketch every column in `columns` across `processes` processes.
+
+    Parameters
+    ----------
+    columns : pandas.DataFrame or dict
+        Columns to sketch, or a dictionary mapping names to pandas.Series.
+
+    Returns
+    -------
+    A dictionary mapping column names to results of `sketch`.
+    """
+    items = [(c, columns[c], numPerm) for c in columns.keys()]
+    if processes == 1 or len(items) < 2:
+        return dict(map(_sketchItem, items))
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        return dict(executor.map(_sketchItem, items))
+
+def nameCandidates(names, patterns=NAME_PATTERNS):
+    """ Candidate key columns extracted from file names with `patterns`.
+
+    Returns
+    -------
+    A pandas.DataFrame with one column per pattern, named by the pattern.
+    """
+    return pd.DataFrame({p: names.astype(str).str.extract(p, expand=False)
+        for p in patterns}, index=names.index)
+
+def suggestLinks(view, meta, viewCols=None, metaCols=None, nameCol='name',
+        patterns=NAME_PATTERNS, threshold=0.8, numPerm=NUM_PERM, processes=None):
+    """ Rank pairs of data and metadata columns by how many of the data
+    values are found in the metadata column.
+
+    Parameters
+    ----------
+    view : pandas.DataFrame
+        The data.
+    meta : pandas.DataFrame
+        The metadata.
+    viewCols : list
+        Optional. Columns of `view` to consider. Defaults to all columns.
+    metaCols : list
+        Optional. Columns of `meta` to consider. Defaults to all columns.
+    nameCol : str
+        Optional. Column of `view` to extract candidate keys from with
+        `patterns`. Defaults to 'name'.
+    patterns : list
+        Optional. Regular expressions with a capture group. Defaults to
+        NAME_PATTERNS.
+    threshold : float
+        Optional. Minimum estimated containment to report. Defaults to 0.8.
+    numPerm : int
+        Optional. Number of hash functions per sketch. Defaults to NUM_PERM.
+    processes : int
+        Optional. Number of processes to sketch columns with.
+        Defaults to the number of CPUs.
+
+    Returns
+    -------
+    A pandas.DataFrame with columns `dataCol`, `regex` (None unless the
+    candidate was extracted from `nameCol`), `metaCol`, `containment`,
+    `dataDistinct` and `metaDistinct`, best matches first.
+    """
+    viewCols = list(view.columns) if viewCols is None else list(viewCols)
+    metaCols = list(meta.columns) if metaCols is None else list(metaCols)
+    data = {c: view[c] for c in viewCols}
+    if nameCol in view.columns and patterns:
+        candidates = nameCandidates(view[nameCol], patterns)
+        for p in candidates.columns:
+            data[(nameCol, p)] = candidates[p]
+    dataSketches = sketchColumns(data, numPerm, processes)
+    metaSketches = sketchColumns(meta[metaCols], numPerm, processes)
+    suggestions = []
+    for d, ds in dataSketches.items():
+        dataCol, regex = d if isinstance(d, tuple) else (d, None)
+        for m, ms in metaSketches.items():
+            c = containment(ds, ms)
+            if c >= threshold:
+                suggestions.append((dataCol, regex, m, c, ds[1], ms[1]))
+    suggestions = pd.DataFrame(suggestions, columns=['dataCol', 'regex',
+        'metaCol', 'containment', 'dataDistinct', 'metaDistinct'])
+    return suggestions.sort_values(['containment', 'dataDistinct'],
+            ascending=False).reset_index(drop=True)
@@ -0,0 +1,176 @@
+import pandas as pd
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+
+NGRAM = 3
+TOP = 3
+THRESHOLD = 0.3
+BATCHSIZE = 1000
+MAX_POSTINGS = 1000
+
+def ngrams(value, n=NGRAM):
+    """ The set of case insensitive `n`-grams of `value`, padded with a
+    space on either side so that short values and their ends count. """
+    padded = " {} ".format(str(value).lower())
+    return {padded[i:i+n] for i in range(max(len(padded) - n + 1, 1))}
+
+class NgramIndex:
+    """ An inverted index from n-grams to the keys which contain them,
+    for finding the keys most similar to a value. """
+
+    def __init__(self, keys, n=NGRAM, maxPostings=MAX_POSTINGS):
+        """
+        Parameters
+        ----------
+        keys : list-like
+            Values to index, e.g. a metadata key column. Duplicates and
+            nulls are dropped.
+        n : int
+            Optional. Length of the n-grams. Defaults to NGRAM.
+        maxPostings : int
+            Optional. N-grams in more than this many keys (like the prefix
+            every key shares) aren't used to find candidates, only to
+            score them. Defaults to MAX_POSTINGS.
+        """
+        self.n = n
+        self.maxPostings = maxPostings
+        self.keys = pd.unique(pd.Series(keys).dropna().astype(str))
+        self._ids = {} # n-gram -> id
+        keyIds, gramIds = [], []
+        for k, key in enumerate(self.keys):
+            for gram in ngrams(key, n):
+                keyIds.append(k)
+                gramIds.append(self._ids.setdefault(gram, len(self._ids)))
+        keyIds = np.array(keyIds, dtype=np.int64)
+        gramIds = np.array(gramIds, dtype=np.int64)
+        # postings of n-gram g are self._postings[self._offsets[g]:self._offsets[g+1]]
+        order = np.argsort(gramIds, kind='stable')
+        self._postings = keyIds[order]
+        self._offsets = np.searchsorted(gramIds[order], np.arange(len(self._ids) + 1))
+        self._sizes = np.bincount(keyIds, minlength=len(self.keys))
+        self._members = {} # common n-gram -> boolean mask of keys, see `self._has`
+
+    def _has(self, g):
+        """ Boolean mask of the keys containing n-gram `g`. """
+        if g not in self._members:
+            mask = np.zeros(len(self.keys), dtype=bool)
+            mask[self._postings[self._offsets[g]:self._offsets[g+1]]] = True
+            self._members[g] = mask
+        return self._members[g]
+
+    def lookup(self, values, top=TOP, threshold=THRESHOLD):
+        """ The `top` keys most similar to each of `values`.
+
+        Similarity is the Jaccard similarity of the n-gram sets. All of
+        `values` are looked up at once: candidates are the keys sharing an
+        uncommon n-gram with a value, found by gathering the postings of
+        every value's uncommon n-grams into one array and counting each
+        (value, key) pair with a single np.unique. Common n-grams are then
+        added to the counts of the candidates which contain them.
+
+        Parameters
+        ----------
+        values : list-like
+        top : int
+            Optional. Candidates to return per value. Defaults to TOP.
+        threshold : float
+            Optional. Minimum similarity of a candidate. Defaults to THRESHOLD.
+
+        Returns
+        -------
+        A pandas.DataFrame with columns `value`, `candidate`, `score` and
+        `rank` (1 for the best candidate of each value).
+        """
+        values = list(values)
+        queryIds, postings, sizes, common = [], [], [], []
+        for q, value in enumerate(values):
+            grams = ngrams(value, self.n)
+            sizes.append(len(grams))
+            grams = [self._ids[g] for g in grams if g in self._ids]
+            lengths = [self._offsets[g+1] - self._offsets[g] for g in grams]
+            rare = [g for g, l in zip(grams, lengths) if l <= self.maxPostings]
+            if not rare and grams: # only common n-grams, use the rarest
+                rare = [grams[int(np.argmin(lengths))]]
+            for g in grams:
+                if g in rare:
+                    p = self._postings[self._offsets[g]:self._offsets[g+1]]
+                    postings.append(p)
+                    queryIds.append(np.full(len(p), q, dtype=np.int64))
+                else:
+                    common.append((q, g))
+        if not postings:
+            return pd.DataFrame(columns=['value', 'candidate', 'score', 'rank'])
+        pairs, shared = np.unique(np.concatenate(queryIds) * len(self.keys)
+                + np.concatenate(postings), return_counts=True)
+        q, k = np.divmod(pairs, len(self.keys))
+        if common:
+            # candidates of each value are a contiguous run of the sorted pairs
+            starts = np.searchsorted(q, np.arange(len(values) + 1))
+            for qc, g in common:
+                run = slice(starts[qc], starts[qc+1])
+                shared[run] += self._has(g)[k[run]]
+        score = shared / (np.array(sizes)[q] + self._sizes[k] - shared)
+        keep = score >= threshold
+        q, k, score = q[keep], k[keep], score[keep]
+        order = np.lexsort((-score, q))
+        q, k, score = q[order], k[order], score[order]
+        # rank of each candidate within its value
+        rank = np.arange(len(q)) - np.searchsorted(q, q) + 1
+        keep = rank <= top
+        return pd.DataFrame({'value': np.asarray(values, dtype=object)[q[keep]],
+            'candidate': self.keys[k[keep]], 'score': score[keep],
+            'rank': rank[keep]})
+
+_index = None
+
+def _initWorker(index):
+    global _index
+    _index = index
+
+def _lookupBatch(args):
+    values, top, threshold = args
+    return _index.lookup(values, top, threshold)
+
+def suggestCorrections(values, keys, top=TOP, threshold=THRESHOLD, n=NGRAM,
+        processes=None, batchSize=BATCHSIZE):
+    """ Suggest the keys which `values` (e.g. keys parsed from file names
+    which were not found in the metadata) were most likely meant to be.
+
+    Parameters
+    ----------
+    values : list-like
+        Values without an exact match in `keys`. Duplicates and nulls
+        are dropped.
+    keys : list-like or NgramIndex
+        The known keys, or an index of them.
+    top : int
+        Optional. Candidates to return per value. Defaults to TOP.
+    threshold : float
+        Optional. Minimum similarity (0 to 1) of a candidate.
+        Defaults to THRESHOLD.
+    n : int
+        Optional. Length of the n-grams to compare. Defaults to NGRAM.
+    processes : int
+        Optional. Number of processes to look up batches of `batchSize`
+        values in. Defaults to the number of CPUs.
+    batchSize : int
+        Optional. Defaults to BATCHSIZE.
+
+    Returns
+    -------
+    A pandas.DataFrame with columns `value`, `candidate`, `score` and `rank`
+    (see `NgramIndex.lookup`).
+    """
+    index = keys if isinstance(keys, NgramIndex) else NgramIndex(keys, n)
+    values = pd.unique(pd.Series(values).dropna().astype(str))
+    batches = [(values[i:i+batchSize], top, threshold)
+            for i in range(0, len(values), batchSize)]
+    if processes == 1 or len(batches) < 2:
+        results = [index.lookup(*b) for b in batches]
+    else:
+        with ProcessPoolExecutor(max_workers=processes, initializer=_initWorker,
+                initargs=(index,)) as executor:
+            results = list(executor.map(_lookupBatch, batches))
+    if not results:
+        return pd.DataFrame(columns=['value', 'candidate', 'score', 'rank'])
+    return pd.concat(results, ignore_index=True)
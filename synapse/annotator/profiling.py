@@ -0,0 +1,49 @@
+import pandas as pd
+
+CHUNKSIZE = 100000
+TOP_K = 5
+STATS = ['rows', 'nulls', 'distinct', 'top', 'minLength', 'maxLength',
+        'meanLength']
+
+def profileColumns(df, cols=None, topK=TOP_K, chunksize=CHUNKSIZE):
+    """ Profile columns of `df` in a single pass over its rows.
+
+    Parameters
+    ----------
+    df : pandas.DataFrame
+    cols : list
+        Optional. Columns to profile. Defaults to all columns.
+    topK : int
+        Optional. Number of most common values to report. Defaults to TOP_K.
+    chunksize : int
+        Optional. Rows to process at a time. Defaults to CHUNKSIZE.
+
+    Returns
+    -------
+    A pandas.DataFrame indexed by column with columns `rows`, `nulls`,
+    `distinct`, `top` (a list of (value, count) tuples), and `minLength`,
+    `maxLength` and `meanLength` of the non-null values as strings.
+    """
+    cols = list(df.columns) if cols is None else list(cols)
+    counts = {c: [] for c in cols}
+    nulls = dict.fromkeys(cols, 0)
+    for start in range(0, len(df), chunksize):
+        for c in cols:
+            chunk = df[c].iloc[start:start+chunksize]
+            vc = chunk.value_counts(dropna=True)
+            nulls[c] += len(chunk) - int(vc.sum())
+            counts[c].append(vc)
+    profile = []
+    for c in cols:
+        vc = pd.concat(counts[c]).groupby(level=0).sum() if counts[c] else \
+                pd.Series(dtype=int)
+        # string lengths are only computed once per distinct value
+        lengths = vc.index.astype(str).str.len().values
+        total = int(vc.sum())
+        top = vc.nlargest(topK)
+        profile.append((len(df), nulls[c], len(vc),
+            list(zip(top.index, top.values.tolist())),
+            lengths.min() if total else None, lengths.max() if total else None,
+            float((lengths * vc.values).sum()) / total if total else None))
+    return pd.DataFrame(profile, index=pd.Index(cols, name='column'),
+            columns=STATS)
@@ -0,0 +1,154 @@
+import pandas as pd
+import numpy as np
+
+# operators a predicate can apply to a column, evaluated on its unique values
+OPERATORS = {
+        'eq': lambda u, v: u == v,
+        'ne': lambda u, v: u != v,
+        'in': lambda u, v: u.isin(list(v)),
+        'notin': lambda u, v: ~u.isin(list(v)),
+        'regex': lambda u, v: u.astype(str).str.contains(v, regex=True),
+        'match': lambda u, v: u.astype(str).str.fullmatch(v),
+        'gt': lambda u, v: pd.to_numeric(u, errors='coerce') > v,
+        'ge': lambda u, v: pd.to_numeric(u, errors='coerce') >= v,
+        'lt': lambda u, v: pd.to_numeric(u, errors='coerce') < v,
+        'le': lambda u, v: pd.to_numeric(u, errors='coerce') <= v}
+
+def parseRule(rule):
+    """ Normalize `rule` to a dictionary with keys `when`, `column` and `value`.
+
+    Parameters
+    ----------
+    rule : tuple or dict
+        A (predicate, column, value) tuple, or a dictionary with those
+        keys as `when`, `column` and `value`.
+
+    Returns
+    -------
+    A dictionary which can be stored as JSON, if the values in `rule` can.
+    """
+    if isinstance(rule, dict):
+        when, column, value = rule.get('when'), rule['column'], rule['value']
+    else:
+        when, column, value = rule
+    # sets and tuples become lists, so that rules can be saved as JSON
+    when = {col: sorted(cond) if isinstance(cond, set) else
+            list(cond) if isinstance(cond, tuple) else cond
+            for col, cond in (when or {}).items()}
+    return {'when': when, 'column': column, 'value': value}
+
+def _conditions(when):
+    """ The (column, operator, operand) conditions of the predicate `when`.
+
+    `when` maps columns to a condition each, all of which must hold:
+    a list, tuple or set is shorthand for 'in', a dictionary maps
+    operators (see OPERATORS, plus 'isnull': bool) to operands, and
+    anything else is shorthand for 'eq'. None or {} holds for every row.
+    """
+    conditions = []
+    for col, cond in (when or {}).items():
+        if isinstance(cond, (list, tuple, set)):
+            cond = {'in': cond}
+        elif not isinstance(cond, dict):
+            cond = {'eq': cond}
+        for op, operand in cond.items():
+            if op != 'isnull' and op not in OPERATORS:
+                raise ValueError("Unrecognized operator for {}: {}".format(col, op))
+            conditions.append((col, op, operand))
+    return conditions
+
+class _Masks:
+    """ Row masks of conditions on the columns of `df`, each column
+    factorized once and each distinct condition evaluated once on its
+    unique values. """
+
+    def __init__(self, df):
+        self.df = df
+        self._factors = {}
+        self._masks = {}
+
+    def condition(self, col, op, operand):
+        key = (col, op, repr(operand))
+        if key not in self._masks:
+            if col not in self._factors:
+                codes, uniques = pd.factorize(self.df[col])
+                self._factors[col] = (codes, pd.Series(uniques, dtype=object))
+            codes, uniques = self._factors[col]
+            if op == 'isnull':
+                unique = np.full(len(uniques), not operand)
+                null = bool(operand)
+            else:
+                unique = np.asarray(OPERATORS[op](uniques, operand), dtype=bool)
+                null = op in ('ne', 'notin') # what null values satisfy
+            # code -1 (null) indexes the trailing element
+            self._masks[key] = np.append(unique, null)[codes]
+        return self._masks[key]
+
+    def predicate(self, when):
+        """ Indices of the rows `when` holds for. """
+        masks = [self.condition(*c) for c in _conditions(when)]
+        if not masks:
+            return np.arange(len(self.df))
+        rows = np.flatnonzero(masks[0])
+        for mask in masks[1:]:
+            rows = rows[mask[rows]]
+        return rows
+
+def applyRules(df, rules, firstMatch=False):
+    """ Set values of `df` where predicates hold.
+
+    Every predicate is evaluated as a vectorized mask (see `_Masks`),
+    precedence between rules setting the same column is resolved on the
+    masks, and each column is then assigned once.
+
+    Parameters
+    ----------
+    df : pandas.DataFrame
+    rules : list
+        Ordered (predicate, column, value) rules (see `parseRule`). A
+        predicate maps columns to conditions, e.g.
+        {'name': {'regex': r'\\.fastq'}, 'parentId': ['syn1', 'syn2']}
+        (see `_conditions`).
+    firstMatch : bool
+        Optional. Whether the first rule which sets a column for a row
+        takes precedence over later ones. Defaults to False (later rules
+        override earlier ones).
+
+    Returns
+    -------
+    A tuple of (a copy of `df` with the rules applied, a pandas.DataFrame
+    report with one row per rule and columns `column`, `value`, `matched`
+    (rows its predicate holds for) and `applied` (rows it set)).
+    """
+    rules = [parseRule(r) for r in rules]
+    masks = _Masks(df)
+    n = len(df)
+    winners = {} # column -> index of the rule which sets each row, or -1
+    matched = [0] * len(rules)
+    applied = [0] * len(rules)
+    order = range(len(rules)) if firstMatch else reversed(range(len(rules)))
+    for i in order:
+        rule = rules[i]
+        rows = masks.predicate(rule['when'])
+        if rule['column'] not in winners:
+            winners[rule['column']] = np.full(n, -1, dtype=np.int64)
+        winner = winners[rule['column']]
+        hit = rows[winner[rows] == -1]
+        winner[hit] = i
+        matched[i] = len(rows)
+        applied[i] = len(hit)
+    df = df.copy()
+    for col, winner in winners.items():
+        hit = winner != -1
+        if not hit.any():
+            continue
+        values = np.empty(len(rules), dtype=object)
+        values[:] = [r['value'] for r in rules]
+        current = df[col].astype(object).values.copy() if col in df.columns \
+                else np.full(n, np.nan, dtype=object)
+        current[hit] = values[winner[hit]]
+        df[col] = pd.Series(current, index=df.index).infer_objects()
+    report = pd.DataFrame({'column': [r['column'] for r in rules],
+        'value': [r['value'] for r in rules], 'matched': matched,
+        'applied': applied})
+    return df, report
@@ -1,8 +1,29 @@
 import pandas as pd
 import synapseclient as sc
+import numpy as np
+from . import frames
+from . import validation
+import importlib
+import os
+import json
+import pickle
 import re
-
-def synread(syn_, synId, sortCols=True):
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+# maximumSize buckets for STRING columns. Sizes are rounded up to a bucket so
+# that small changes in the data don't change the schema.
+SIZE_BUCKETS = [50, 100, 250, 500, 1000]
+DEFAULT_SIZE = 50
+INFER_CHUNKSIZE = 100000
+SYNREAD_THREADS = 8 # entities to download at once
+# record of downloaded entities, see synapse/synapseCache.py
+ENTITY_INDEX = ".entityIndex"
+
+# default column models of views, keyed by (viewType, scope).
+# See `getViewColumns`.
+_viewColumnsCache = {}
+
+def synread(syn_, synId, sortCols=True, entity=None):
     """ A simple way to read in Synapse entities to pandas.DataFrame objects.
 
     Parameters
@@ -10,9 +31,12 @@ def synread(syn_, synId, sortCols=True):
     syn_ : synapseclient.Synapse
     synId : str or list
         Synapse entity to read or a list of Synapse entities to concatenate
-        column-wise.
+        column-wise. Entities in a list are fetched concurrently.
     sortCols : bool
         Optional. Whether to sort columns lexicographically. Defaults to True.
+    entity : synapseclient.Entity
+        Optional. The already fetched entity `synId` (a str) refers to,
+        so that it isn't fetched again.
 
     Returns
     -------
@@ -20,25 +44,65 @@ def synread(syn_, synId, sortCols=True):
     """
     #if "syn" in globals(): syn_ = syn
     if isinstance(synId, str):
-        f = syn_.get(synId)
+        f = syn_.get(synId) if entity is None else entity
         d = _synread(synId, f, syn_, sortCols)
     else: # is list-like
-        files = list(map(syn_.get, synId))
-        d = [_synread(synId_, f, syn_, sortCols) for synId_, f in zip(synId, files)]
+        read = lambda synId_: _synread(synId_, syn_.get(synId_), syn_, sortCols)
+        with ThreadPoolExecutor(max_workers=SYNREAD_THREADS) as executor:
+            d = list(executor.map(read, synId))
     return d
 
+def synreadChunked(syn_, synId, path, chunksize=frames.CHUNKSIZE, entity=None):
+    """ Read a Synapse table, file view or CSV file to disk as a
+    `frames.ChunkedView`, without holding it in memory.
+
+    Parameters
+    ----------
+    syn_ : synapseclient.Synapse
+    synId : str
+    path : str
+        Where to store the Arrow IPC file.
+    chunksize : int
+        Optional. Rows per batch. Defaults to frames.CHUNKSIZE.
+    entity : synapseclient.Entity
+        Optional. The already fetched entity `synId` refers to.
+
+    Returns
+    -------
+    A frames.ChunkedView
+    """
+    f = syn_.get(synId) if entity is None else entity
+    if isinstance(f, sc.entity.File):
+        _recordCached(f, syn_)
+        csvPath = f.path
+    else:
+        csvPath = syn_.tableQuery("select * from %s" % synId,
+                resultsAs="csv").filepath
+    return frames.ChunkedView.fromCsv(csvPath, path, chunksize)
+
 def _synread(synId, f, syn_, sortCols):
     """ See `synread` """
     if isinstance(f, sc.entity.File):
+        _recordCached(f, syn_)
         d = pd.read_csv(f.path, header="infer", sep=None, engine="python")
     elif isinstance(f, (sc.table.EntityViewSchema, sc.table.Schema)):
         q = syn_.tableQuery("select * from %s" % synId)
         d = q.asDataFrame();
     if sortCols:
-        return d.sort_index(1)
+        return d.sort_index(axis=1)
     else:
         return d
 
+def _recordCached(f, syn_):
+    """ Record the entity and version of a downloaded file, so that
+    synapseCache.py can report what it evicts. """
+    try:
+        with open(os.path.join(syn_.cache.cache_root_dir, ENTITY_INDEX), "a") as index:
+            index.write("{}\t{}\t{}\n".format(f.dataFileHandleId, f.id,
+                f.versionNumber))
+    except (AttributeError, OSError):
+        pass
+
 def convertClipboardToDict(sep):
     """ Parse two-column delimited clipboard contents to a dictionary.
 
@@ -55,7 +119,88 @@ def convertClipboardToDict(sep):
     d = {k: v for k, v in zip(df[0], df[1])}
     return d
 
-def _keyValCols(keys, values, asSynapseCols):
+def _bucketSize(length, buckets=SIZE_BUCKETS):
+    """ Round `length` up to the nearest of `buckets`.
+
+    Returns
+    -------
+    The bucketed size, or None if `length` exceeds every bucket.
+    """
+    i = np.searchsorted(buckets, length)
+    return buckets[i] if i < len(buckets) else None
+
+def inferColumns(df, chunksize=INFER_CHUNKSIZE, buckets=SIZE_BUCKETS):
+    """ Infer the tightest Synapse `columnType` and `maximumSize` for each
+    column of `df`.
+
+    Columns are scanned `chunksize` rows at a time. Object columns are always
+    STRING (so values like '001' keep their leading zeros) and are sized to
+    the longest value rounded up to one of `buckets`, or LARGETEXT if longer
+    than every bucket. Numeric columns are INTEGER if every value is whole,
+    otherwise DOUBLE. Columns with no values are left out.
+
+    Parameters
+    ----------
+    df : pandas.DataFrame
+    chunksize : int
+        Optional. Rows to scan at a time. Defaults to INFER_CHUNKSIZE.
+    buckets : list
+        Optional. Sorted sizes to round `maximumSize` up to.
+        Defaults to SIZE_BUCKETS.
+
+    Returns
+    -------
+    A dictionary mapping column names to dictionaries with keys
+    `columnType` and (for STRING columns) `maximumSize`.
+    """
+    inferred = {}
+    for col in df.columns:
+        dtype = df[col].dtype
+        if pd.api.types.is_bool_dtype(dtype):
+            inferred[col] = {'columnType': 'BOOLEAN'}
+            continue
+        isNumeric = pd.api.types.is_numeric_dtype(dtype)
+        isWhole, maxLength, hasValues = True, 0, False
+        for start in range(0, len(df), chunksize):
+            values = df[col].iloc[start:start+chunksize].dropna()
+            if not len(values):
+                continue
+            hasValues = True
+            if isNumeric:
+                isWhole = isWhole and bool((values % 1 == 0).all())
+            else:
+                maxLength = max(maxLength, int(values.astype(str).str.len().max()))
+        if not hasValues:
+            continue
+        elif isNumeric:
+            inferred[col] = {'columnType': 'INTEGER' if isWhole else 'DOUBLE'}
+        else:
+            size = _bucketSize(maxLength, buckets)
+            inferred[col] = {'columnType': 'LARGETEXT'} if size is None else \
+                    {'columnType': 'STRING', 'maximumSize': size}
+    return inferred
+
+def widestColumns(*inferred):
+    """ Combine results of `inferColumns` into types and sizes which can hold
+    the values of all of them. """
+    numeric = ['INTEGER', 'DOUBLE']
+    widest = {}
+    for i in inferred:
+        for col, c in i.items():
+            w = widest.get(col)
+            if w is None or w == c:
+                widest[col] = c
+            elif w['columnType'] in numeric and c['columnType'] in numeric:
+                widest[col] = {'columnType': 'DOUBLE'}
+            elif 'LARGETEXT' in (w['columnType'], c['columnType']):
+                widest[col] = {'columnType': 'LARGETEXT'}
+            else: # at least one STRING, numbers fit in the smallest bucket
+                widest[col] = {'columnType': 'STRING', 'maximumSize': max(
+                    w.get('maximumSize', SIZE_BUCKETS[0]),
+                    c.get('maximumSize', SIZE_BUCKETS[0]))}
+    return widest
+
+def _keyValCols(keys, values, asSynapseCols, inferred=None):
     """ Get Synapse Column compatible objects from `keys` and `values`.
 
     Parameters
@@ -66,19 +211,35 @@ def _keyValCols(keys, values, asSynapseCols):
         `defaultValue`s of each column.
     asSynapseCols : bool
         Whether to return as synapseclient.Column objects.
+    inferred : dict
+        Optional. Column types and sizes from `inferColumns`. STRING columns
+        are made large enough to hold their `defaultValue`, and columns stay
+        STRING if their `defaultValue` can't be stored as the inferred type.
 
     Returns
     -------
     A list of dictionaries compatible with synapseclient.Column objects.
     """
-    val_length = map(lambda v : len(v) if v else 50, values)
-    cols = [{'name': k, 'maximumSize': l,
-        'columnType': "STRING", "defaultValue": v}
-            for k, v, l in zip(keys, values, val_length)]
-    if asSynapseCols: cols = list(map(sc.Column, cols))
+    inferred = inferred or {}
+    cols = []
+    for k, v in zip(keys, values):
+        size = _bucketSize(len(str(v))) if v else DEFAULT_SIZE
+        c = {'name': k, 'columnType': "STRING", "defaultValue": v,
+                'maximumSize': size}
+        if k in inferred and (pd.isnull(v) or validation._coercible(
+                pd.Series([v]), inferred[k]['columnType'])[0]):
+            c.update(inferred[k])
+            if c['columnType'] == 'STRING' and v:
+                c['maximumSize'] = None if size is None else \
+                        max(c['maximumSize'], size)
+        if c['columnType'] != 'STRING' or c['maximumSize'] is None:
+            c.pop('maximumSize')
+            if c['columnType'] == 'STRING': c['columnType'] = 'LARGETEXT'
+        cols.append(c)
+    if asSynapseCols: cols = [sc.Column(**c) for c in cols]
     return cols
 
-def _colsFromFile(fromFile, asSynapseCols):
+def _colsFromFile(fromFile, asSynapseCols, inferred=None):
     """ Get Synapse Column compatible objects from a filepath.
 
     Parameters
@@ -87,15 +248,17 @@ def _colsFromFile(fromFile, asSynapseCols):
         Filepath to a delimited, two-column file.
     asSynapseCols : bool
         Whether to return as synapseclient.Column objects.
+    inferred : dict
+        Optional. Column types and sizes from `inferColumns`.
 
     Returns
     -------
     A list of dictionaries compatible with synapseclient.Column objects.
     """
     f = pd.read_csv(fromFile, header=None)
-    return _keyValCols(f[0].values, f[1].values, asSynapseCols)
+    return _keyValCols(f[0].values, f[1].values, asSynapseCols, inferred)
 
-def _colsFromDict(d, asSynapseCols):
+def _colsFromDict(d, asSynapseCols, inferred=None):
     """ Get Synapse Column compatible objects from a dictionary.
 
     Parameters
@@ -104,6 +267,8 @@ def _colsFromDict(d, asSynapseCols):
         A dictionary containing column name -> defaultValue pairs.
     asSynapseCols : bool
         Whether to return as synapseclient.Column objects.
+    inferred : dict
+        Optional. Column types and sizes from `inferColumns`.
 
     Returns
     -------
@@ -111,9 +276,9 @@ def _colsFromDict(d, asSynapseCols):
     """
     keys = [i[0] for i in d.items()]
     values = [i[1] for i in d.items()]
-    return _keyValCols(keys, values, asSynapseCols)
+    return _keyValCols(keys, values, asSynapseCols, inferred)
 
-def _colsFromList(l, asSynapseCols):
+def _colsFromList(l, asSynapseCols, inferred=None):
     """ Get Synapse Column compatible objects from a list.
 
     Parameters
@@ -122,6 +287,8 @@ def _colsFromList(l, asSynapseCols):
         A list containing column names.
     asSynapseCols : bool
         Whether to return as synapseclient.Column objects.
+    inferred : dict
+        Optional. Column types and sizes from `inferColumns`.
 
     Returns
     -------
@@ -129,9 +296,9 @@ def _colsFromList(l, asSynapseCols):
     """
     keys = l
     values = [None for i in l]
-    return _keyValCols(keys, values, asSynapseCols)
+    return _keyValCols(keys, values, asSynapseCols, inferred)
 
-def makeColumns(obj, asSynapseCols=True):
+def makeColumns(obj, asSynapseCols=True, inferred=None):
     """ Create new Synapse.Column compatible objects.
 
     Parameters
@@ -140,30 +307,166 @@ def makeColumns(obj, asSynapseCols=True):
         object to parse to columns.
     asSynapseCols : bool
         Optional. Whether to return as synapseclient.Column objects. Defaults to True.
+    inferred : dict
+        Optional. Column types and sizes (see `inferColumns`) to use for
+        columns in `obj`. Other columns are STRING columns sized to their
+        `defaultValue`. Defaults to None.
+
+    Returns
+    -------
+    A list of dictionaries compatible with synapseclient.Column objects.
+    """
+    if isinstance(obj, str): return _colsFromFile(obj, asSynapseCols, inferred)
+    elif isinstance(obj, dict): return _colsFromDict(obj, asSynapseCols, inferred)
+    elif isinstance(obj, list): return _colsFromList(obj, asSynapseCols, inferred)
+
+def getViewColumns(syn, scope, viewType='file'):
+    """ Get the default column models for a view over `scope`.
+
+    Results are cached per view type and scope, so creating many views
+    over the same scope only asks Synapse once.
+
+    Parameters
+    ----------
+    syn : synapseclient.Synapse
+    scope : str or list
+        Synapse IDs of items included in the view.
+    viewType : str
+        Optional. Type of view. Defaults to 'file'.
 
     Returns
     -------
     A list of dictionaries compatible with synapseclient.Column objects.
     """
-    if isinstance(obj, str): return _colsFromFile(obj, asSynapseCols)
-    elif isinstance(obj, dict): return _colsFromDict(obj, asSynapseCols)
-    elif isinstance(obj, list): return _colsFromList(obj, asSynapseCols)
+    if isinstance(scope, str): scope = [scope]
+    key = (viewType, tuple(sorted(scope)))
+    if key not in _viewColumnsCache:
+        params = {'scope': list(scope), 'viewType': viewType}
+        _viewColumnsCache[key] = syn.restPOST('/column/view/scope',
+                json.dumps(params))['results']
+    # copies, so callers are free to modify them
+    return [dict(c) for c in _viewColumnsCache[key]]
+
+def sharedKey(frames):
+    """ The first column of `frames[0]` which every frame in `frames` has,
+    or None if there isn't one. """
+    for c in frames[0].columns:
+        if all(c in f.columns for f in frames[1:]):
+            return c
+    return None
+
+def combineTabulars(frames, key, sources=None):
+    """ Outer join `frames` on their `key` column in a single pass.
+
+    Every key is hashed once, into an index over the union of the keys of
+    all frames, and each frame is collapsed onto that index. The result is
+    built one frame at a time, so memory is proportional to the number of
+    distinct keys rather than to the product of the frames. Rows with a
+    null key are dropped.
 
-def combineSynapseTabulars(syn, tabulars):
-    """ Concatenate tabular files column-wise.
+    Parameters
+    ----------
+    frames : list
+        pandas.DataFrame objects which each have a `key` column.
+    key : str
+        Column to join on.
+    sources : list
+        Optional. Names of `frames` to use in the conflict report.
+        Defaults to the position of each frame in `frames`.
+
+    Returns
+    -------
+    A tuple of (combined pandas.DataFrame with one row per key,
+    conflicts). Where frames (or rows of the same frame) disagree on a
+    non-null value, the first value is kept and the disagreement is
+    reported in `conflicts`, a pandas.DataFrame with columns `key`,
+    `column`, `sources` and `values`.
+    """
+    sources = list(range(len(frames))) if sources is None else list(sources)
+    missing = [s for s, f in zip(sources, frames) if key not in f.columns]
+    if missing:
+        raise KeyError("{} is not a column of {}".format(
+            key, ", ".join(map(str, missing))))
+    codes, keys = pd.factorize(pd.concat([f[key] for f in frames],
+        ignore_index=True))
+    bounds = np.cumsum([0] + [len(f) for f in frames])
+    combined = {}
+    collapsed = []
+    conflicted = set()
+    for i, f in enumerate(frames):
+        fCodes = codes[bounds[i]:bounds[i+1]]
+        keyed = fCodes != -1
+        # position of each key's first row in `f`, or -1
+        first = np.full(len(keys), -1, dtype=np.intp)
+        first[fCodes[keyed][::-1]] = np.flatnonzero(keyed)[::-1]
+        duplicates = np.bincount(fCodes[keyed], minlength=len(keys)) > 1
+        for c in f.columns.drop(key):
+            values = pd.api.extensions.take(f[c].values, first, allow_fill=True)
+            values = pd.Series(values)
+            if duplicates.any(): # rows of the same frame which disagree
+                dups = pd.Series(f[c].values[keyed]).groupby(fCodes[keyed])
+                disagree = dups.nunique() > 1
+                conflicted.update((k, c) for k in disagree.index[disagree.values])
+                values = values.fillna(dups.first().reindex(values.index))
+            if c in combined:
+                current = combined[c]
+                clash = (current.notnull() & values.notnull() &
+                        (current != values)).values
+                conflicted.update((k, c) for k in np.flatnonzero(clash))
+                combined[c] = current.fillna(values)
+            else:
+                combined[c] = values
+        collapsed.append((fCodes, f))
+    found = {kc: ([], []) for kc in conflicted}
+    conflictCodes = np.array(sorted({k for k, c in conflicted}), dtype=codes.dtype)
+    for s, (fCodes, f) in zip(sources, collapsed):
+        rows = np.flatnonzero(np.isin(fCodes, conflictCodes))
+        for c in f.columns.drop(key):
+            for k, v in zip(fCodes[rows], f[c].values[rows]):
+                if (k, c) in found and pd.notnull(v):
+                    found[(k, c)][0].append(s)
+                    found[(k, c)][1].append(v)
+    conflicts = [(keys[k], c) + found[(k, c)] for k, c in
+            sorted(conflicted, key=lambda kc: (kc[0], str(kc[1])))]
+    combined = pd.DataFrame(dict([(key, keys)] + list(combined.items())))
+    conflicts = pd.DataFrame(conflicts, columns=['key', 'column', 'sources', 'values'])
+    return combined, conflicts
+
+def combineSynapseTabulars(syn, tabulars, key=None, sortCols=True):
+    """ Combine tabular files by joining them on a shared key column.
 
     Parameters
     ----------
     syn : synapseclient.Synapse
     tabulars : list
-        A list of Synapse IDs referencing delimited files to combine column-wise.
+        A list of Synapse IDs referencing delimited files to combine.
+    key : str
+        Optional. Column to join on (see `combineTabulars`). Defaults to
+        the first column every file has. If there isn't one, the files
+        are concatenated column-wise by row position.
+    sortCols : bool
+        Optional. Whether to sort columns lexicographically. Defaults to True.
 
     Returns
     -------
-    pandas.DataFrame
+    A tuple of (combined pandas.DataFrame, conflicts), where `conflicts`
+    is a pandas.DataFrame of conflicting values (see `combineTabulars`),
+    or None if the files were combined by row position.
     """
-    tabulars = synread(syn, tabulars)
-    return pd.concat(tabulars, axis=1, ignore_index=True).sort_index(1)
+    frames = synread(syn, tabulars, sortCols=False)
+    key = sharedKey(frames) if key is None else key
+    if key is None:
+        print("The files share no key column and were combined by row position.")
+        combined = pd.concat(frames, axis=1)
+        conflicts = None
+    else:
+        combined, conflicts = combineTabulars(frames, key, sources=tabulars)
+        if len(conflicts):
+            print("{} values conflict between (or within) the files, "
+                  "keeping the first of each.".format(len(conflicts)))
+    if sortCols:
+        combined = combined.sort_index(axis=1)
+    return combined, conflicts
 
 def inferValues(df, col, referenceCols):
     """ Fill in values for indices which match on `referenceCols`
@@ -206,6 +509,22 @@ def substituteColumnValues(referenceList, mod):
             type(referenceList)))
     return referenceList
 
+def parseRanges(text, n):
+    """ Parse 1-based numbers and ranges like "1,3-5" into 0-based indices.
+
+    Raises
+    ------
+    ValueError if `text` isn't a list of numbers and ranges from 1 to `n`.
+    """
+    indices = []
+    for part in filter(None, re.split(r"[,\s]+", text)):
+        start, _, end = part.partition('-')
+        start, end = int(start), int(end or start)
+        if not 1 <= start <= end <= n:
+            raise ValueError("{} is out of range".format(part))
+        indices.extend(range(start - 1, end))
+    return sorted(set(indices))
+
 def makeColFromRegex(referenceList, regex):
     """ Return a list created by mapping a regular expression to another list.
     The regular expression must contain at least one capture group.
@@ -230,3 +549,68 @@ def makeColFromRegex(referenceList, regex):
         if not m: print("{} does not match regex.".format(s))
         newCol.append(m.group(1)) if m else newCol.append(None)
     return newCol
+
+def resolveFunction(func):
+    """ Import a function named like 'module:qualname', or return `func`
+    if it is already callable. """
+    if callable(func):
+        return func
+    module, _, qualname = func.partition(":")
+    obj = importlib.import_module(module)
+    for attr in qualname.split("."):
+        obj = getattr(obj, attr)
+    return obj
+
+def functionName(func):
+    """ The 'module:qualname' of `func`, or None if it can't be imported
+    by name (e.g. a lambda or nested function). """
+    qualname = getattr(func, '__qualname__', '')
+    if not qualname or '<' in qualname:
+        return None
+    return "{}:{}".format(func.__module__, qualname)
+
+def _callTuple(args):
+    func, values = args
+    return [func(*v) for v in values]
+
+def mapUnique(df, func, inputs, processes=None, chunksize=1000):
+    """ Apply `func` to each row of `df[inputs]`, calling it only once for
+    each unique combination of input values.
+
+    Parameters
+    ----------
+    df : pandas.DataFrame
+    func : callable
+        Called as `func(*values)` with the values of `inputs` in a row.
+    inputs : str or list
+        Column(s) of `df` to pass to `func`.
+    processes : int
+        Optional. Number of processes to evaluate `func` across. Defaults to
+        the number of CPUs. Functions which can't be pickled (like lambdas)
+        are evaluated in this process.
+    chunksize : int
+        Optional. Unique input combinations sent to a process at a time.
+
+    Returns
+    -------
+    A numpy.ndarray of results, one per row of `df`.
+    """
+    if isinstance(inputs, str): inputs = [inputs]
+    keys = df[inputs]
+    codes = keys.groupby(inputs, dropna=False, sort=False).ngroup().values
+    uniques = list(keys.drop_duplicates().itertuples(index=False, name=None))
+    chunks = [(func, uniques[i:i+chunksize])
+            for i in range(0, len(uniques), chunksize)]
+    try:
+        pickle.dumps(func)
+        picklable = True
+    except (pickle.PicklingError, AttributeError, TypeError):
+        picklable = False
+    if processes == 1 or len(chunks) < 2 or not picklable:
+        results = [r for c in map(_callTuple, chunks) for r in c]
+    else:
+        with ProcessPoolExecutor(max_workers=processes) as executor:
+            results = [r for c in executor.map(_callTuple, chunks) for r in c]
+    out = np.empty(len(results), dtype=object)
+    out[:] = results
+    return pd.Series(out).infer_objects().values[codes]
@@ -0,0 +1,208 @@
+import pandas as pd
+import numpy as np
+
+RULES = ['notnull', 'values', 'regex', 'maxLength', 'type', 'unique']
+ENTITY_ID = r"^syn\d+(?:\.\d+)?$"
+
+def rulesFromColumns(columns):
+    """ Derive validation rules from Synapse column models.
+
+    Parameters
+    ----------
+    columns : list of dict-like
+        synapseclient.Column objects (or dictionaries with the same keys).
+
+    Returns
+    -------
+    A dictionary mapping column names to rules (see `validate`).
+    """
+    rules = {}
+    for c in columns:
+        r = {'type': c.get('columnType', 'STRING')}
+        if c.get('maximumSize') and r['type'] in ('STRING', 'LINK'):
+            r['maxLength'] = int(c['maximumSize'])
+        if c.get('enumValues'):
+            r['values'] = list(c['enumValues'])
+        rules[c['name']] = r
+    return rules
+
+def mergeRules(*rules):
+    """ Combine rule dictionaries. Later rules override earlier ones. """
+    merged = {}
+    for r in rules:
+        for col, colRules in r.items():
+            merged.setdefault(col, {}).update(colRules)
+    return merged
+
+def _coercible(values, columnType):
+    """ Boolean mask of which non-null `values` can be stored as `columnType`. """
+    if columnType in ('INTEGER', 'DOUBLE', 'DATE', 'FILEHANDLEID', 'USERID'):
+        numeric = pd.to_numeric(values, errors='coerce')
+        ok = numeric.notnull()
+        if columnType == 'DATE': # epoch milliseconds or a parsable date
+            ok |= pd.to_datetime(values, errors='coerce').notnull()
+        elif columnType != 'DOUBLE':
+            ok &= numeric.fillna(0) % 1 == 0
+        return ok.values
+    elif columnType == 'BOOLEAN':
+        return values.astype(str).str.lower().isin(['true', 'false']).values
+    elif columnType == 'ENTITYID':
+        return values.astype(str).str.match(ENTITY_ID).values
+    return np.ones(len(values), dtype=bool)
+
+def _violations(col, colRules):
+    """ Evaluate every rule for one column.
+
+    The column is factorized once and each rule is evaluated on its unique
+    values, then broadcast back to the rows through the factor codes.
+
+    Returns
+    -------
+    A list of (rule, mask) tuples where `mask` is True for violating rows.
+    """
+    codes, uniques = pd.factorize(col)
+    uniques = pd.Series(uniques)
+    notnull = codes != -1
+    # every string rule shares a single conversion of the unique values
+    asStr = uniques.astype(str) if any(r in colRules for r in
+            ('regex', 'maxLength')) else None
+    masks = []
+    def expand(uniqueMask):
+        mask = np.zeros(len(col), dtype=bool)
+        mask[notnull] = np.asarray(uniqueMask, dtype=bool)[codes[notnull]]
+        return mask
+    if colRules.get('notnull'):
+        masks.append(('notnull', ~notnull))
+    if 'values' in colRules:
+        masks.append(('values', expand(~uniques.isin(colRules['values']).values)))
+    if 'regex' in colRules:
+        masks.append(('regex', expand(
+            ~asStr.str.fullmatch(colRules['regex']).values.astype(bool))))
+    if 'maxLength' in colRules:
+        masks.append(('maxLength', expand(
+            asStr.str.len().values > colRules['maxLength'])))
+    if 'type' in colRules:
+        masks.append(('type', expand(~_coercible(uniques, colRules['type']))))
+    if colRules.get('unique'):
+        counts = np.bincount(codes[notnull], minlength=len(uniques))
+        masks.append(('unique', expand(counts > 1)))
+    return masks
+
+def validate(df, rules, sampleSize=5):
+    """ Validate `df` against declarative, per-column rules.
+
+    Each column is scanned once, with every rule evaluated as a vectorized
+    mask over the column's unique values.
+
+    Parameters
+    ----------
+    df : pandas.DataFrame
+    rules : dict
+        Mapping from column names to a dictionary of rules. Supported rules:
+            notnull : bool -- no null values.
+            values : list-like -- allowed values.
+            regex : str -- values must fully match this regular expression.
+            maxLength : int -- maximum length of values as strings.
+            type : str -- a Synapse columnType values must be coercible to.
+            unique : bool -- no duplicated values (a key column).
+        Null values only count as violations of `notnull`.
+    sampleSize : int
+        Optional. Number of violating row indices to report per rule.
+        Defaults to 5.
+
+    Returns
+    -------
+    A pandas.DataFrame with one row per violated rule and columns
+    `column`, `rule`, `violations` (count) and `sample` (row indices).
+    """
+    report = []
+    for col, colRules in rules.items():
+        unknown = set(colRules).difference(RULES)
+        if unknown:
+            raise ValueError("Unrecognized rules for {}: {}".format(
+                col, ", ".join(unknown)))
+        if col not in df.columns:
+            report.append((col, 'missing', len(df), []))
+            continue
+        for rule, mask in _violations(df[col], colRules):
+            count = int(mask.sum())
+            if count:
+                report.append((col, rule, count,
+                    list(df.index[mask][:sampleSize])))
+    return pd.DataFrame(report, columns=['column', 'rule', 'violations', 'sample'])
+
+def _hashes(col):
+    """ 64 bit hashes of the non-null values of `col`, in order. """
+    return pd.util.hash_pandas_object(col.dropna(), index=False).values
+
+def validateBatches(batches, rules, sampleSize=5):
+    """ Validate a view too large for memory, one pandas.DataFrame from
+    `batches` at a time (see `validate`).
+
+    `unique` is checked across the whole view: the values of `unique`
+    columns are hashed as each batch is validated, and only if a hash
+    repeats are the batches read again to find sample rows.
+
+    Parameters
+    ----------
+    batches : callable
+        Returns an iterator of the batches of the view each time it's
+        called, e.g. `frames.ChunkedView.batches`.
+    rules : dict
+        See `validate`.
+    sampleSize : int
+        Optional. Defaults to 5.
+
+    Returns
+    -------
+    A pandas.DataFrame like the one returned by `validate`, summed over
+    the batches.
+    """
+    uniqueCols = [c for c, r in rules.items() if r.get('unique')]
+    batchRules = {c: {rule: v for rule, v in r.items() if rule != 'unique'}
+            for c, r in rules.items()}
+    reports, hashes = [], {c: [] for c in uniqueCols}
+    for b in batches():
+        reports.append(validate(b, batchRules, sampleSize))
+        for c in uniqueCols:
+            if c in b.columns:
+                hashes[c].append(_hashes(b[c]))
+    report = pd.concat(reports, ignore_index=True) if reports else \
+            validate(pd.DataFrame(), {}, sampleSize)
+    report = report.groupby(['column', 'rule'], sort=False, as_index=False).agg(
+            violations=('violations', 'sum'),
+            sample=('sample', lambda s: sum(s, [])[:sampleSize]))
+    repeated = {} # column -> (repeated hashes, rows with a repeated value)
+    for c, h in hashes.items():
+        if h:
+            values, counts = np.unique(np.concatenate(h), return_counts=True)
+            if (counts > 1).any():
+                repeated[c] = (values[counts > 1], int(counts[counts > 1].sum()))
+    samples = {c: [] for c in repeated}
+    if repeated:
+        for b in batches():
+            for c, (values, _) in repeated.items():
+                if c in b.columns and len(samples[c]) < sampleSize:
+                    notnull = b[c].notnull().values
+                    mask = np.zeros(len(b), dtype=bool)
+                    mask[notnull] = np.isin(_hashes(b[c]), values)
+                    samples[c] += list(b.index[mask][:sampleSize - len(samples[c])])
+            if all(len(s) >= sampleSize for s in samples.values()):
+                break
+    unique = pd.DataFrame([(c, 'unique', count, samples[c])
+        for c, (_, count) in repeated.items()], columns=report.columns)
+    return pd.concat([report, unique], ignore_index=True) if len(unique) else report
+
+def formatWarnings(report):
+    """ Turn a report from `validate` into human readable warnings. """
+    messages = {
+            'missing': "{} is missing from the view",
+            'notnull': "{} has null values",
+            'values': "{} has values outside of its allowed values",
+            'regex': "{} has values which do not match its format",
+            'maxLength': "{} has values longer than its maximum size",
+            'type': "{} has values which are not of its column type",
+            'unique': "{} has duplicate values"}
+    return ["{} ({} rows, e.g. {}).".format(messages[rule].format(col), count,
+        ", ".join(map(str, sample)))
+        for col, rule, count, sample in report.itertuples(index=False)]
@@ -1,5 +1,6 @@
 import synapseclient as sc
 import pandas as pd
+import numpy as np
 import argparse
 
 def read_args():
@@ -7,6 +8,8 @@ def read_args():
                 'as pandas DataFrame.')
     parser.add_argument('evaluationId', type=int, help='ID of the evaluation queue.')
     parser.add_argument('--outputPath', help='(optional). Path to write .csv to.')
+    parser.add_argument('--scores', nargs='*', help='(optional). Numeric '
+            'annotations to include as columns. All of them if no names are given.')
     return parser.parse_args()
 
 def getFailureReasons(s):
@@ -47,7 +50,36 @@ def getTeamNames(s):
         teamNames.append(team)
     return teamNames
 
-def buildLeaderboard(s):
+def getNumericAnnotations(s, keys=None):
+    """ Get numeric (double and long) annotations from submissions.
+
+    Parameters
+    ----------
+    s : list
+        A list of tuples containing a :py:class:`synapseclient.evaluation.Submission`
+        and a :py:class:`synapseclient.evaluation.SubmissionStatus`.
+    keys : list
+        Optional. Annotations to get. Defaults to every numeric annotation.
+
+    Returns
+    -------
+    A dictionary mapping annotation keys to float numpy arrays, with NaN
+    where a submission doesn't have the annotation.
+    """
+    values = {} if keys is None else {k: {} for k in keys}
+    for i, t in enumerate(s):
+        annotations = t[1]['annotations']
+        for k in annotations.get('doubleAnnos', []) + annotations.get('longAnnos', []):
+            if keys is None or k['key'] in values:
+                values.setdefault(k['key'], {})[i] = k['value']
+    arrays = {}
+    for key, v in values.items():
+        a = np.full(len(s), np.nan)
+        a[list(v.keys())] = list(v.values())
+        arrays[key] = a
+    return arrays
+
+def buildLeaderboard(s, scores=None):
     """ Return leaderboard as pandas DataFrame.
 
     Parameters
@@ -55,6 +87,10 @@ def buildLeaderboard(s):
     s : list
         A list of tuples containing a :py:class:`synapseclient.evaluation.Submission`
         and a :py:class:`synapseclient.evaluation.SubmissionStatus`.
+    scores : list or bool
+        Optional. Numeric annotations (e.g. ['auprc']) to add as columns,
+        or True for all of them (see `getNumericAnnotations`).
+        Defaults to None.
     """
     submissionIds = [t[1]['id'] for t in s]
     failureReasons = getFailureReasons(s)
@@ -66,20 +102,22 @@ def buildLeaderboard(s):
     teamIds = [t[0]['teamId'] if 'teamId' in t[0] else None for t in s]
     evaluationIds = [t[0]['evaluationId'] for t in s]
     entityIds = [t[0]['entityId'] for t in s]
-    """
-    auprs = [t[1]['annotations']['doubleAnnos'][0]['value']
-            if 'doubleAnnos' in t[1]['annotations'] else None for t in s]
-    """
     leaderboard = pd.DataFrame({'createdOn': createdOns,
         'entityId': entityIds, 'evaluationId': evaluationIds, 'name': names,
         'status': statuses, 'submissionId': submissionIds, 'team': teamNames,
         'teamId': teamIds, 'userId': userIds})
+    if scores:
+        keys = None if scores is True else scores
+        for k, v in getNumericAnnotations(s, keys).items():
+            if k not in leaderboard.columns:
+                leaderboard[k] = v
     return leaderboard
 
 if __name__ == '__main__':
     args = read_args()
     syn = sc.login()
     s = list(syn.getSubmissionBundles(args.evaluationId))
-    leaderboard = buildLeaderboard(s)
+    scores = args.scores if args.scores else args.scores == []
+    leaderboard = buildLeaderboard(s, scores)
     if args.outputPath:
         leaderboard.to_csv(args.outputPath, index=False)
@@ -0,0 +1,221 @@
+import pandas as pd
+import numpy as np
+import argparse
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+BOOTSTRAPS = 1000
+BATCHSIZE = 100 # resamples computed at once
+CONFIDENCE = 0.95
+
+def read_args():
+    parser = argparse.ArgumentParser(description='Rank a leaderboard exported '
+                'by exportEvaluation.py, with bootstrapped confidence intervals.')
+    parser.add_argument('leaderboard', nargs='?', help='.csv written by '
+            'exportEvaluation.py --scores.')
+    parser.add_argument('--metrics', nargs='+', help='Score columns to rank on.')
+    parser.add_argument('--ascending', nargs='*', default=[],
+            help='Metrics for which lower is better.')
+    parser.add_argument('--perCase', nargs='*', default=[], metavar='METRIC=PATH',
+            help='.csv of per-case scores for METRIC, indexed by submissionId '
+            'with a column per case, to bootstrap over.')
+    parser.add_argument('--bootstrap', type=int, default=BOOTSTRAPS,
+            help='Number of resamples (default %d).' % BOOTSTRAPS)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--processes', type=int,
+            help='Number of processes (default the number of CPUs).')
+    parser.add_argument('--outputPath', help='(optional). Path to write .csv to.')
+    parser.add_argument('--benchmark', action='store_true', help='Time '
+            'bootstrapping 10000 submissions x 1000 resamples on random scores.')
+    return parser.parse_args()
+
+def rank(scores, ascending=False):
+    """ Competition ("1224") ranks of `scores` along the last axis.
+
+    Tied scores share the best of their ranks and NaN scores rank last.
+
+    Parameters
+    ----------
+    scores : numpy.ndarray
+        A 1 or 2 dimensional array. Rows of a 2 dimensional array are
+        ranked independently.
+    ascending : bool
+        Optional. Whether lower scores are better. Defaults to False.
+
+    Returns
+    -------
+    An integer numpy.ndarray shaped like `scores`.
+    """
+    scores = np.asarray(scores, dtype=float)
+    oneDimensional = scores.ndim == 1
+    scores = np.atleast_2d(scores)
+    keys = np.where(np.isnan(scores), np.inf, scores if ascending else -scores)
+    order = np.argsort(keys, axis=1)
+    ordered = np.take_along_axis(keys, order, axis=1)
+    # position of the first of each run of equal scores
+    starts = np.ones(ordered.shape, dtype=bool)
+    starts[:,1:] = ordered[:,1:] != ordered[:,:-1]
+    positions = np.arange(ordered.shape[1])
+    firsts = np.maximum.accumulate(np.where(starts, positions, 0), axis=1)
+    ranks = np.empty(order.shape, dtype=np.int64)
+    np.put_along_axis(ranks, order, firsts + 1, axis=1)
+    return ranks[0] if oneDimensional else ranks
+
+def rankLeaderboard(leaderboard, metrics, ascending=()):
+    """ Rank `leaderboard` on each of `metrics`.
+
+    Parameters
+    ----------
+    leaderboard : pandas.DataFrame
+        As returned by `exportEvaluation.buildLeaderboard(s, scores=...)`.
+    metrics : list
+        Numeric columns of `leaderboard`.
+    ascending : list-like
+        Optional. Metrics for which lower is better.
+
+    Returns
+    -------
+    A copy of `leaderboard` with `<metric>_rank` and `<metric>_tied`
+    columns for each metric.
+    """
+    leaderboard = leaderboard.copy()
+    for m in metrics:
+        scores = pd.to_numeric(leaderboard[m], errors='coerce').values
+        ranks = rank(scores, m in ascending)
+        leaderboard["{}_rank".format(m)] = ranks
+        leaderboard["{}_tied".format(m)] = pd.Series(ranks).duplicated(
+                keep=False).values & ~np.isnan(scores)
+    return leaderboard
+
+def _bootstrapChunk(args):
+    """ Mean scores and ranks of `perCase` for `n` resamples of its cases.
+
+    Each batch of resamples is drawn as a matrix of how many times each
+    case was drawn, so the scores of every submission in the batch are a
+    single matrix product.
+    """
+    perCase, n, ascending, seed, batchSize = args
+    rng = np.random.default_rng(seed)
+    numCases = perCase.shape[1]
+    valid = ~np.isnan(perCase)
+    filled = np.where(valid, perCase, 0)
+    scores, ranks = [], []
+    for start in range(0, n, batchSize):
+        size = min(batchSize, n - start)
+        counts = rng.multinomial(numCases, np.full(numCases, 1 / numCases),
+                size=size).astype(float)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            means = (counts @ filled.T) / (counts @ valid.T)
+        scores.append(means)
+        ranks.append(rank(means, ascending))
+    return np.vstack(scores), np.vstack(ranks)
+
+def bootstrap(perCase, n=BOOTSTRAPS, ascending=False, confidence=CONFIDENCE,
+        seed=0, processes=None, batchSize=BATCHSIZE):
+    """ Bootstrap confidence intervals of mean scores and of ranks by
+    resampling cases with replacement.
+
+    Parameters
+    ----------
+    perCase : numpy.ndarray
+        Scores of each submission (rows) on each case (columns).
+        NaN scores are left out of a submission's mean.
+    n : int
+        Optional. Number of resamples. Defaults to BOOTSTRAPS.
+    ascending : bool
+        Optional. Whether lower scores are better. Defaults to False.
+    confidence : float
+        Optional. Width of the confidence intervals. Defaults to CONFIDENCE.
+    seed : int
+        Optional. Seed for the resampling. Defaults to 0.
+    processes : int
+        Optional. Number of processes to split the resamples between.
+        Defaults to the number of CPUs.
+    batchSize : int
+        Optional. Resamples computed at once per process. Defaults to BATCHSIZE.
+
+    Returns
+    -------
+    A pandas.DataFrame with a row per submission and columns `scoreLow`,
+    `scoreHigh`, `rankLow` and `rankHigh`.
+    """
+    perCase = np.asarray(perCase, dtype=float)
+    if n <= batchSize: # a single batch
+        processes = 1
+    seeds = np.random.SeedSequence(seed).spawn(max(1, -(-n // batchSize)))
+    chunks = [(perCase, min(batchSize, n - i * batchSize), ascending, s, batchSize)
+            for i, s in enumerate(seeds)]
+    if processes == 1:
+        results = list(map(_bootstrapChunk, chunks))
+    else:
+        with ProcessPoolExecutor(max_workers=processes) as executor:
+            results = list(executor.map(_bootstrapChunk, chunks))
+    scores = np.vstack([r[0] for r in results])
+    ranks = np.vstack([r[1] for r in results])
+    tail = (1 - confidence) / 2 * 100
+    # nanpercentile is much slower, so it's only used if it has to be
+    percentile = np.nanpercentile if np.isnan(scores).any() else np.percentile
+    with np.errstate(invalid='ignore'):
+        scoreLow, scoreHigh = percentile(scores, [tail, 100 - tail], axis=0)
+    rankLow, rankHigh = np.percentile(ranks, [tail, 100 - tail], axis=0)
+    return pd.DataFrame({'scoreLow': scoreLow, 'scoreHigh': scoreHigh,
+        'rankLow': rankLow, 'rankHigh': rankHigh})
+
+def rankWithIntervals(leaderboard, metrics, perCase=None, ascending=(),
+        n=BOOTSTRAPS, confidence=CONFIDENCE, seed=0, processes=None):
+    """ Rank `leaderboard` (see `rankLeaderboard`) and add bootstrapped
+    confidence intervals for the metrics in `perCase`.
+
+    Parameters
+    ----------
+    perCase : dict
+        Optional. Maps metrics to a pandas.DataFrame of per-case scores,
+        indexed by submissionId with a column per case.
+
+    Returns
+    -------
+    A copy of `leaderboard` with rank, tie and (for the metrics in
+    `perCase`) `<metric>_scoreLow`, `_scoreHigh`, `_rankLow` and
+    `_rankHigh` columns.
+    """
+    leaderboard = rankLeaderboard(leaderboard, metrics, ascending)
+    for m, cases in (perCase or {}).items():
+        cases = cases.reindex(leaderboard['submissionId'].values)
+        intervals = bootstrap(cases.values, n, m in ascending, confidence,
+                seed, processes)
+        for c in intervals.columns:
+            leaderboard["{}_{}".format(m, c)] = intervals[c].values
+    return leaderboard
+
+def benchmark(submissions=10000, cases=100, n=1000, processes=None):
+    """ Time `bootstrap` on random per-case scores, in one process and
+    in `processes` processes. """
+    perCase = np.random.default_rng(0).random((submissions, cases))
+    for p in [1] if processes == 1 else [1, processes]:
+        start = time.perf_counter()
+        bootstrap(perCase, n, processes=p)
+        print("{} submissions x {} cases x {} resamples, {} processes: {:.1f} s".format(
+            submissions, cases, n, p or "all", time.perf_counter() - start))
+
+def main():
+    args = read_args()
+    if args.benchmark:
+        benchmark(n=args.bootstrap, processes=args.processes)
+        return
+    if args.leaderboard is None:
+        raise SystemExit("A leaderboard is required unless --benchmark is given.")
+    leaderboard = pd.read_csv(args.leaderboard)
+    perCase = {}
+    for spec in args.perCase:
+        metric, path = spec.split('=', 1)
+        perCase[metric] = pd.read_csv(path, index_col='submissionId')
+    metrics = args.metrics or list(perCase)
+    ranked = rankWithIntervals(leaderboard, metrics, perCase, args.ascending,
+            args.bootstrap, seed=args.seed, processes=args.processes)
+    if args.outputPath:
+        ranked.to_csv(args.outputPath, index=False)
+    else:
+        print(ranked.to_string(index=False))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,275 @@
+import os
+import re
+import shutil
+import argparse
+import logging
+from collections import namedtuple
+
+# logging config
+logging.basicConfig(format='%(asctime)s %(message)s')
+logger = logging.getLogger("defaultLogger")
+logger.setLevel(logging.INFO)
+
+# global constants
+CACHE_PATH = os.path.expanduser("~/.synapseCache")
+PIN_FILE = os.path.expanduser("~/.synapseCache.pinned")
+CACHE_MAP = ".cacheMap"
+# file handle ID, entity ID and version of each downloaded file, one
+# tab separated line per download, kept at the top of the cache
+ENTITY_INDEX = ".entityIndex"
+SIZE_UNITS = {"": 1, "K": 1024, "M": 1024**2, "G": 1024**3, "T": 1024**4}
+
+# one cached file handle. `entityId` and `versionNumber` are only known for
+# files recorded when they were downloaded (see `recordEntity`) or resolved
+# through Synapse (see `resolveEntities`).
+CacheEntry = namedtuple("CacheEntry", ["fileHandleId", "path", "size",
+    "lastAccess", "entityId", "versionNumber"])
+
+def readargs():
+    """Read in command line arguments.
+
+    Returns
+    -------
+    args : dict
+        contains arguments passed.
+    """
+    parser = argparse.ArgumentParser(description="Report on and evict least \
+            recently used files from the Synapse cache.")
+    parser.add_argument("action", choices=["report", "evict"])
+    parser.add_argument("--budget", default="0", help="Size to shrink the \
+            cache to, e.g. 500M or 20G (defaults to 0).")
+    parser.add_argument("--pin", nargs="*", default=[], help="Synapse IDs \
+            (optionally with a .version) or file handle IDs to never evict.")
+    parser.add_argument("--pinFile", default=PIN_FILE, help="File listing \
+            one pinned ID per line (defaults to {}).".format(PIN_FILE))
+    parser.add_argument("--cachePath", default=CACHE_PATH, help="Location of \
+            the Synapse cache (defaults to {}).".format(CACHE_PATH))
+    args = parser.parse_args()
+    return args
+
+def parseSize(size):
+    """Parse a human readable size like '20G' to a number of bytes."""
+    m = re.match(r"^\s*(\d+(?:\.\d+)?)\s*([KMGT]?)I?B?\s*$", str(size).upper())
+    if not m:
+        raise ValueError("Unrecognized size: {}".format(size))
+    return int(float(m.group(1)) * SIZE_UNITS[m.group(2)])
+
+def formatSize(size):
+    """Format a number of bytes as a human readable size."""
+    for unit in ["", "K", "M", "G"]:
+        if abs(size) < 1024:
+            return "{:.1f}{}B".format(size, unit)
+        size /= 1024
+    return "{:.1f}TB".format(size)
+
+def recordEntity(f, cachePath=CACHE_PATH):
+    """Record the entity and version of a file downloaded to the cache.
+
+    Arguments
+    ---------
+    f : synapseclient.File
+        An entity returned by `syn.get`.
+    cachePath : str
+        Location of the Synapse cache.
+    """
+    fileHandleId = f.get("dataFileHandleId")
+    if fileHandleId is None or f.get("path") is None:
+        return
+    if not os.path.isdir(cachePath):
+        return
+    with open(os.path.join(cachePath, ENTITY_INDEX), "a") as index:
+        index.write("{}\t{}\t{}\n".format(fileHandleId, f.id,
+            f.get("versionNumber")))
+
+def readEntities(cachePath=CACHE_PATH):
+    """Read the entities recorded by `recordEntity`.
+
+    Returns
+    -------
+    A dictionary mapping file handle IDs to (entityId, versionNumber)
+    tuples. The most recent record of a file handle wins.
+    """
+    entities = {}
+    path = os.path.join(cachePath, ENTITY_INDEX)
+    if not os.path.exists(path):
+        return entities
+    with open(path) as f:
+        for line in f:
+            fields = line.rstrip("\n").split("\t")
+            if len(fields) == 3:
+                entities[fields[0]] = (fields[1], fields[2])
+    return entities
+
+def forgetEntities(fileHandleIds, cachePath=CACHE_PATH):
+    """Drop the records of `fileHandleIds` from the entity index."""
+    fileHandleIds = set(fileHandleIds)
+    entities = readEntities(cachePath)
+    if not fileHandleIds.intersection(entities):
+        return
+    with open(os.path.join(cachePath, ENTITY_INDEX), "w") as f:
+        for fileHandleId, (entityId, versionNumber) in entities.items():
+            if fileHandleId not in fileHandleIds:
+                f.write("{}\t{}\t{}\n".format(fileHandleId, entityId,
+                    versionNumber))
+
+def indexCache(cachePath=CACHE_PATH, entities=None):
+    """Index the Synapse cache by file handle.
+
+    The cache is laid out as `<cachePath>/<bucket>/<fileHandleId>/`, where
+    each file handle directory holds the downloaded file(s) and a .cacheMap.
+    Entities and versions come from the records of `recordEntity`.
+
+    Arguments
+    ---------
+    cachePath : str
+        Location of the Synapse cache.
+    entities : dict
+        Optional. Mapping from file handle IDs to (entityId, versionNumber)
+        tuples, as returned by `resolveEntities`. These take precedence
+        over the recorded entities.
+
+    Returns
+    -------
+    A list of CacheEntry, least recently accessed first.
+    """
+    entities = dict(readEntities(cachePath), **(entities or {}))
+    index = []
+    if not os.path.isdir(cachePath):
+        return index
+    for bucket in os.scandir(cachePath):
+        if not bucket.is_dir():
+            continue
+        for handle in os.scandir(bucket.path):
+            if not handle.is_dir() or not handle.name.isdigit():
+                continue
+            size, lastAccess = 0, 0
+            for root, dirs, files in os.walk(handle.path):
+                for f in files:
+                    stat = os.stat(os.path.join(root, f))
+                    size += stat.st_size
+                    if f != CACHE_MAP:
+                        lastAccess = max(lastAccess, stat.st_atime, stat.st_mtime)
+            entityId, versionNumber = entities.get(handle.name, (None, None))
+            index.append(CacheEntry(handle.name, handle.path, size,
+                lastAccess, entityId, versionNumber))
+    index.sort(key=lambda e: e.lastAccess)
+    return index
+
+def readPins(pins=None, pinFile=PIN_FILE):
+    """Combine `pins` with the IDs listed in `pinFile` (if it exists)."""
+    pins = list(pins or [])
+    if pinFile and os.path.exists(pinFile):
+        with open(pinFile) as f:
+            pins += [l.strip() for l in f if l.strip() and not l.startswith("#")]
+    return pins
+
+def resolveEntities(syn, synIds):
+    """Look up the file handles of Synapse entities without downloading them.
+
+    Tables and views (such as a Pipeline's view or metadata) have no single
+    file handle; their cached query results are left to the LRU order.
+
+    Arguments
+    ---------
+    syn : synapseclient.Synapse
+    synIds : list
+        Synapse IDs, optionally with a version, e.g. 'syn123.4'.
+
+    Returns
+    -------
+    A dictionary mapping file handle IDs to (entityId, versionNumber) tuples.
+    """
+    entities = {}
+    for synId in synIds:
+        entityId, _, version = synId.partition(".")
+        f = syn.get(entityId, version=int(version) if version else None,
+                downloadFile=False)
+        fileHandleId = f.get("dataFileHandleId")
+        if fileHandleId is None:
+            logger.info("{} has no file handle, not pinning".format(synId))
+            continue
+        entities[str(fileHandleId)] = (f.id, f.get("versionNumber"))
+    return entities
+
+def planEviction(index, budget, pinned=()):
+    """Choose which entries to evict to fit the cache within `budget` bytes.
+
+    Arguments
+    ---------
+    index : list
+        CacheEntry objects, least recently accessed first.
+    budget : int
+        Target size of the cache in bytes.
+    pinned : set
+        File handle IDs to never evict.
+
+    Returns
+    -------
+    A list of CacheEntry to evict, least recently accessed first.
+    """
+    total = sum(e.size for e in index)
+    evict = []
+    for e in index:
+        if total <= budget:
+            break
+        if e.fileHandleId in pinned:
+            continue
+        evict.append(e)
+        total -= e.size
+    return evict
+
+def evict(entries, cachePath=CACHE_PATH):
+    """Remove `entries` from the cache. Returns the number of bytes freed."""
+    freed = 0
+    for e in entries:
+        shutil.rmtree(e.path, ignore_errors=True)
+        freed += e.size
+    forgetEntities([e.fileHandleId for e in entries], cachePath)
+    return freed
+
+def _describe(e):
+    """Entity, version and file handle of a CacheEntry."""
+    if e.entityId is None:
+        return "unknown entity ({})".format(e.fileHandleId)
+    return "{}.{} ({})".format(e.entityId, e.versionNumber, e.fileHandleId)
+
+def report(index, budget=0, pinned=()):
+    """Print the size of the cache and how much of it can be reclaimed."""
+    total = sum(e.size for e in index)
+    pinnedSize = sum(e.size for e in index if e.fileHandleId in pinned)
+    evictable = planEviction(index, budget, pinned)
+    reclaimable = sum(e.size for e in evictable)
+    print("Cached files:", len(index))
+    print("Total size:", formatSize(total))
+    print("Pinned:", formatSize(pinnedSize))
+    print("Reclaimable (budget {}): {}".format(formatSize(budget),
+        formatSize(reclaimable)))
+    if evictable:
+        print("Would evict, least recently used first:")
+    for e in evictable:
+        print("  {} {}".format(_describe(e), formatSize(e.size)))
+    kept = [e for e in index if e.fileHandleId in pinned]
+    if kept:
+        print("Pinned files:")
+    for e in kept:
+        print("  {} {}".format(_describe(e), formatSize(e.size)))
+
+def main():
+    args = readargs()
+    budget = parseSize(args.budget)
+    pins = readPins(args.pin, args.pinFile)
+    synIds = [p for p in pins if p.lower().startswith("syn")]
+    entities = {}
+    if synIds:
+        import synapseclient as sc
+        entities = resolveEntities(sc.login(silent=True), synIds)
+    pinned = set(entities).union(p for p in pins if p.isdigit())
+    index = indexCache(args.cachePath, entities)
+    if args.action == "report":
+        report(index, budget, pinned)
+    else:
+        freed = evict(planEviction(index, budget, pinned), args.cachePath)
+        logger.info("Freed {} from {}".format(formatSize(freed), args.cachePath))
+
+if __name__ == "__main__":
+    main()
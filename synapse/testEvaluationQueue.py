@@ -4,6 +4,8 @@ import pandas as pd
 import os
 import glob
 import argparse
+import zlib
+from concurrent.futures import ProcessPoolExecutor
 from itertools import product
 import logging
 
@@ -14,6 +16,8 @@ logger.setLevel(logging.INFO)
 
 # global constants
 TEST_SUBMISSION_PATH = "testSubmissions"
+CHUNKSIZE = 100000 # rows written at a time
+RANDOM_CHARS = [chr(c) for c in range(41, 123)]
 
 def readargs():
     """Read in command line arguments.
@@ -31,13 +35,223 @@ def readargs():
             seperated list of columns required to be in submission \
             (defaults to first column of sampleSubmission).")
     parser.add_argument("--filetype", help="csv or tsv")
+    parser.add_argument("--cases", help="Comma seperated list of test \
+            cases to generate (defaults to all cases).")
+    parser.add_argument("--seed", type=int, default=0, help="Seed used \
+            to generate random test cases (defaults to 0).")
+    parser.add_argument("--processes", type=int, help="Number of processes \
+            to generate test cases with (defaults to number of CPUs).")
     parser.add_argument("evaluationQueue", type=int, help="ID of Synapse Evaluation")
     parser.add_argument("sampleSubmission", type=str, help="A .csv or .tsv file \
             which is known to pass all test cases.")
     args = parser.parse_args()
     return args
 
-def writeSubmissions(sampleSubmission, indexCols=None, filetype="csv"):
+# registry of test cases, name -> function(sample, path, rng)
+CASES = {}
+
+def registerCase(name):
+    """ Register a function as the test case `name`.
+
+    The function is called as `f(sample, path, rng)` where `sample` is the
+    shared `SampleSubmission`, `path` the file to write to and `rng` a
+    `numpy.random.Generator` seeded for this case.
+    """
+    def register(f):
+        CASES[name] = f
+        return f
+    return register
+
+class SampleSubmission:
+    """ A parsed sample submission, serialized once and shared by every case.
+
+    Attributes
+    ----------
+    frame : pandas.DataFrame
+        The parsed sample, indexed on the required columns.
+    delimiter : str
+    body : bytes
+        `frame` serialized with `delimiter`.
+    indexBody : bytes
+        Only the index columns of `frame` serialized with `delimiter`.
+    patchable : bool
+        Whether `body` contains no quoted fields, in which case the header,
+        rows and fields of `body` can be found by splitting on newlines
+        and `delimiter`, and cases can patch bytes instead of reserializing.
+    """
+
+    def __init__(self, frame, delimiter):
+        self.frame = frame
+        self.delimiter = delimiter
+        self.body = frame.to_csv(sep=delimiter,
+                lineterminator="\n").encode()
+        self.indexBody = pd.DataFrame({}, index=frame.index).to_csv(
+                sep=delimiter, lineterminator="\n").encode()
+        self.patchable = b'"' not in self.body
+
+    def _firstRowBounds(self):
+        """ Start and end (including newline) of the first data row in `body`. """
+        rowStart = self.body.index(b"\n") + 1
+        rowEnd = self.body.index(b"\n", rowStart) + 1
+        return rowStart, rowEnd
+
+    def firstRow(self):
+        """ The first data row of `body`, including its newline. """
+        rowStart, rowEnd = self._firstRowBounds()
+        return self.body[rowStart:rowEnd]
+
+    def withFirstValue(self, value):
+        """ `body` with the first non-index value of the first row replaced
+        by `value` (bytes). """
+        rowStart, rowEnd = self._firstRowBounds()
+        fields = self.body[rowStart:rowEnd-1].split(self.delimiter.encode())
+        fields[self.frame.index.nlevels] = value
+        return b"".join([self.body[:rowStart],
+            self.delimiter.encode().join(fields), self.body[rowEnd-1:]])
+
+def _casePath(name, filetype):
+    """ Path to write the test submission `name` to. """
+    return "{}/{}.{}".format(TEST_SUBMISSION_PATH, name, filetype)
+
+def _caseRng(name, seed):
+    """ Random generator for a single case.
+
+    Seeded from both `seed` and the case name so that each case produces the
+    same output no matter which other cases are generated or in which order.
+    """
+    return np.random.default_rng([seed, zlib.crc32(name.encode())])
+
+def _writeFrame(df, path, **kwargs):
+    """ Stream `df` to `path` in chunks of CHUNKSIZE rows. """
+    df.to_csv(path, chunksize=CHUNKSIZE, **kwargs)
+
+def _writeBytes(path, *parts):
+    with open(path, "wb") as f:
+        for part in parts:
+            f.write(part)
+
+def _randomColumn(rng, t, n):
+    """ Generate a column of `n` random values of type `t` without
+    creating a Python object per cell.
+
+    Arguments
+    ---------
+    rng : numpy.random.Generator
+    t : str
+        One of 'float', 'int' or 'str'.
+    n : int
+        Length of column.
+
+    Returns
+    -------
+    numpy.ndarray or pandas.Categorical
+    """
+    if t == "str":
+        # printable characters '(' through 'z', stored as category codes
+        codes = rng.integers(0, len(RANDOM_CHARS), size=n, dtype=np.int8)
+        return pd.Categorical.from_codes(codes, categories=RANDOM_CHARS)
+    values = rng.integers(10, size=n) + rng.standard_normal(n)
+    if t == "int":
+        values = values.astype(np.int64)
+    return values
+
+def _randomColumnsCase(i, t, na):
+    """ Build a case writing `i` columns of random `t` values (with
+    a NA in the first cell of the first column if `na`). """
+    def writeCase(sample, path, rng):
+        index = sample.frame.index
+        raw_df = {"col{}".format(j): _randomColumn(rng, t, len(index))
+                for j in range(i)}
+        if na:
+            col0 = raw_df["col0"]
+            if isinstance(col0, pd.Categorical):
+                col0 = pd.Categorical.from_codes(
+                        np.concatenate([[-1], col0.codes[1:]]),
+                        categories=col0.categories)
+            else:
+                col0 = col0.astype(float)
+                col0[0] = float("nan")
+            raw_df["col0"] = col0
+        df = pd.DataFrame(raw_df, index=index)
+        _writeFrame(df, path, index=True, header=True, sep=sample.delimiter)
+    return writeCase
+
+@registerCase("blankSpace")
+def _blankSpace(sample, path, rng):
+    """ A single blank space. """
+    _writeBytes(path, b" ")
+
+@registerCase("randomBinary")
+def _randomBinary(sample, path, rng):
+    """ Random binary file. """
+    _writeBytes(path, rng.bytes(1024))
+
+@registerCase("onlyIndexCols")
+def _onlyIndexCols(sample, path, rng):
+    """ Only required columns. """
+    _writeBytes(path, sample.indexBody)
+
+@registerCase("onlyIndexColsWithQuoting")
+def _onlyIndexColsWithQuoting(sample, path, rng):
+    """ Only required columns with quoting. """
+    _writeFrame(pd.DataFrame({}, index=sample.frame.index), path,
+            index=True, quoting=1, sep=sample.delimiter)
+
+@registerCase("onlyIndexColsWithTrailingComma")
+def _onlyIndexColsWithTrailingComma(sample, path, rng):
+    """ Only required columns with trailing comma. """
+    _writeBytes(path, sample.indexBody.replace(b"\n", b",\n"))
+
+@registerCase("wrongDelimiter")
+def _wrongDelimiter(sample, path, rng):
+    """ Wrong delimiter. """
+    if sample.patchable and b" " not in sample.body:
+        _writeBytes(path, sample.body.replace(sample.delimiter.encode(), b" "))
+    else:
+        _writeFrame(sample.frame, path, sep=" ")
+
+@registerCase("duplicateIndices")
+def _duplicateIndices(sample, path, rng):
+    """ Duplicated indices. """
+    if sample.patchable:
+        _writeBytes(path, sample.body, sample.firstRow())
+    else:
+        _writeFrame(pd.concat([sample.frame, sample.frame.iloc[[0]]]), path,
+                sep=sample.delimiter)
+
+def _firstValueCase(value):
+    """ Build a case replacing the first value of the sample with `value`. """
+    def writeCase(sample, path, rng):
+        if sample.patchable:
+            _writeBytes(path, sample.withFirstValue(repr(value).encode()))
+        else:
+            sample_copy = sample.frame.copy()
+            sample_copy.iloc[0,0] = value
+            _writeFrame(sample_copy, path, index=True, sep=sample.delimiter)
+    return writeCase
+
+# infinite values
+registerCase("infiniteValue")(_firstValueCase(float('inf')))
+# a REALLY BIG (but less than infinite) value
+registerCase("reallyBigValue")(_firstValueCase(2e64))
+# one, two, and five columns of random floats, ints, strings with/without NAs
+for i, t, na in product([1,2,5], ["float", "int", "str"], [True, False]):
+    registerCase("{}Col_{}_na{}".format(i, t, na))(_randomColumnsCase(i, t, na))
+
+# per-process state set by _initWorker, so the sample is only sent once
+_worker = {}
+
+def _initWorker(sample, filetype, seed):
+    _worker.update(sample=sample, filetype=filetype, seed=seed)
+
+def _writeCase(name):
+    """ Write the test submission `name` using the per-process sample. """
+    CASES[name](_worker["sample"], _casePath(name, _worker["filetype"]),
+            _caseRng(name, _worker["seed"]))
+    return name
+
+def writeSubmissions(sampleSubmission, indexCols=None, filetype="csv",
+        cases=None, seed=0, processes=None):
     """Write a number of submissions to the path indicated by TEST_SUBMISSION_PATH.
 
     Arguments
@@ -49,76 +263,39 @@ def writeSubmissions(sampleSubmission, indexCols=None, filetype="csv"):
         (default first col of sampleSubmission).
     filetype : str
         filename extension to append to filenames (default 'csv').
+    cases : list-like
+        Names of cases (see `registerCase`) to generate (default all cases).
+    seed : int
+        Seed for the random values in each case (default 0).
+    processes : int
+        Number of worker processes to write cases with (default number
+        of CPUs). If 1, cases are written in this process.
 
     Returns
     -------
     None
     """
+    cases = list(CASES) if cases is None else list(cases)
+    unknown = [c for c in cases if c not in CASES]
+    if unknown:
+        raise ValueError("Unrecognized test cases: {}".format(", ".join(unknown)))
     sample = pd.read_csv(sampleSubmission, sep=None, engine='python',
             index_col=indexCols)
     if not indexCols: # default index is first column
         sample = sample.set_index(sample.columns[0], drop=True)
-    sample_index = sample.index
-    delimiter = "," if filetype == "csv" else "\t"
+    sample = SampleSubmission(sample, "," if filetype == "csv" else "\t")
     # write test submissions to file
-    logger.info("Writing submissions to {} in .{} format".format(
-        TEST_SUBMISSION_PATH, filetype))
-    # a single blank space
-    with open("{}/blankSpace.{}".format(TEST_SUBMISSION_PATH, filetype), "w") as f:
-        f.write(" ")
-    # random binary file
-    with open("{}/randomBinary.{}".format(TEST_SUBMISSION_PATH, filetype), "wb") as f:
-        f.write(os.urandom(1024))
-    # only required columns
-    pd.DataFrame({}, index=sample_index).to_csv(
-            "{}/onlyIndexCols.{}".format(TEST_SUBMISSION_PATH, filetype),
-            index=True, sep=delimiter)
-    # only required columns with quoting
-    pd.DataFrame({}, index=sample_index).to_csv(
-            "{}/onlyIndexColsWithQuoting.{}".format(TEST_SUBMISSION_PATH, filetype),
-            index=True, quoting=1, sep=delimiter)
-    # only required columns with trailing comma
-    with open("{}/onlyIndexCols.{}".format(
-        TEST_SUBMISSION_PATH, filetype), "r") as f:
-        result = "\n".join(["%s," % l for l in f.read().split("\n")])
-        with open("{}/onlyIndexColsWithTrailingComma.{}".format(
-            TEST_SUBMISSION_PATH, filetype), "w") as output:
-            output.write(result)
-    # wrong delimiter
-    sample.to_csv("{}/wrongDelimiter.{}".format(
-        TEST_SUBMISSION_PATH, filetype), sep=" ")
-    # duplicated indices
-    sample.append(sample.iloc[0]).to_csv("{}/duplicateIndices.{}".format(
-        TEST_SUBMISSION_PATH, filetype), sep=delimiter)
-    # infinite values
-    sample_copy = sample.copy()
-    sample_copy.iloc[0,0] = float('inf')
-    sample_copy.to_csv("{}/infiniteValue.{}".format(
-        TEST_SUBMISSION_PATH, filetype), index=True, sep=delimiter)
-    # a REALLY BIG (but less than infinite) value
-    sample_copy.iloc[0,0] = 2e64
-    sample_copy.to_csv("{}/reallyBigValue.{}".format(
-        TEST_SUBMISSION_PATH, filetype), index=True, sep=delimiter)
-    # one, two, and five columns of random floats, ints, strings with/without NAs
-    for i, t, na in product([1,2,5], [float, int, str], [True, False]):
-        cases = {float: "float", int: "int", str: "str"}
-        if t == int or t == float:
-            raw_df = {
-                    "col{}".format(j):
-                    list(map(t, np.random.randint(10, size=len(sample_index))
-                        + np.random.randn(len(sample_index))))
-                    for j in range(i)}
-        elif t == str:
-            raw_df = {
-                    "col{}".format(j):
-                    list(map(chr, np.random.randint(41, 123, len(sample_index))))
-                    for j in range(i)}
-        if na:
-            raw_df['col0'][0] = float("nan")
-        df = pd.DataFrame(raw_df, index=sample_index)
-        df.to_csv("{}/{}Col_{}_na{}.{}".format(
-            TEST_SUBMISSION_PATH, i, cases[t], na, filetype),
-            index=True, header=True, sep=delimiter)
+    logger.info("Writing {} submissions to {} in .{} format".format(
+        len(cases), TEST_SUBMISSION_PATH, filetype))
+    if processes == 1:
+        _initWorker(sample, filetype, seed)
+        for name in cases:
+            _writeCase(name)
+        return
+    with ProcessPoolExecutor(max_workers=processes, initializer=_initWorker,
+            initargs=(sample, filetype, seed)) as executor:
+        for name in executor.map(_writeCase, cases):
+            logger.debug("Wrote {}".format(name))
 
 def storeSubmissions(syn, evaluationQueue, synProject=None, filetype="csv"):
     """Store submissions on Synapse and submit to the evaluation queue.
@@ -159,7 +336,9 @@ def main():
     args = readargs()
     args.filetype = "csv" if not args.filetype else args.filetype
     indexCols = None if not args.indexCols else args.indexCols.split(",")
-    writeSubmissions(args.sampleSubmission, indexCols, args.filetype)
+    cases = None if not args.cases else args.cases.split(",")
+    writeSubmissions(args.sampleSubmission, indexCols, args.filetype,
+            cases, args.seed, args.processes)
     storeSubmissions(syn, args.evaluationQueue, args.synProject, args.filetype)
     logger.info("Finished")
 
@@ -0,0 +1,20 @@
+import numpy as np
+from annotator import fileformats
+
+def test_unknown_format_in_archive_is_the_archive():
+    formats, compression = fileformats.classify(['x.y.zip', 'x.y.7z'])
+    assert list(formats) == ['zip', '7z']
+    assert list(compression) == ['zip', '7z']
+
+def test_known_formats_and_fallback():
+    names = ['a.bam.bai', 'reads.fastq.gz', 'b.tar.gz', 'c.tgz', 'd.xyz.bz2',
+            'dir.v2/e', np.nan, 'f.fq.zip']
+    formats, compression = fileformats.classify(names)
+    assert list(formats) == ['bai', 'fastq', 'tar', 'tar', 'xyz', None, None,
+            'fastq']
+    assert list(compression) == [None, 'gzip', 'gzip', 'gzip', 'bzip2', None,
+            None, 'zip']
+
+def test_no_fallback():
+    formats, _ = fileformats.classify(['x.y.zip', 'x.unknown'], fallback=False)
+    assert list(formats) == ['zip', None]
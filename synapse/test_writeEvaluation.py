@@ -0,0 +1,36 @@
+import pandas as pd
+import writeEvaluation
+
+def _leaderboard():
+    return pd.DataFrame({'createdOn': ['2018-01-01', '2018-01-02'],
+        'entityId': ['syn1', 'syn2'], 'evaluationId': ['9', '9'],
+        'name': ['a', 'b'], 'status': ['SCORED', 'SCORED'],
+        'submissionId': ['1', '2'], 'team': ['red', 'blue'],
+        'teamId': [None, '3'], 'userId': ['4', '5'], 'auprc': [0.5, 0.75],
+        'auprc_rank': [2, 1], 'failureReason': [None, 'timeout']})
+
+def _service():
+    return writeEvaluation.FakeEvaluationService([
+        {'id': '1', 'status': 'RECEIVED', 'annotations': {}},
+        {'id': '2', 'status': 'RECEIVED', 'annotations': {'stringAnnos': [
+            {'key': 'team', 'value': 'blue', 'isPrivate': False}]}}])
+
+def _keys(status):
+    return sorted(a['key'] for t in writeEvaluation.ANNOTATION_TYPES
+            for a in status['annotations'].get(t, []))
+
+def test_default_columns_are_leaderboard_columns():
+    service = _service()
+    report = writeEvaluation.writeStatuses(service, 9, _leaderboard())
+    statuses = service.getStatuses(9)
+    assert _keys(statuses['1']) == ['auprc', 'auprc_rank']
+    assert _keys(statuses['2']) == ['auprc', 'auprc_rank', 'failureReason', 'team']
+    assert statuses['1']['status'] == 'RECEIVED'
+    assert all('team' not in changed for changed in report['changed'])
+
+def test_unchanged_statuses_are_not_sent():
+    service = _service()
+    writeEvaluation.writeStatuses(service, 9, _leaderboard())
+    report = writeEvaluation.writeStatuses(service, 9, _leaderboard())
+    assert len(service.batches) == 1
+    assert (report['result'] == 'unchanged').all()
@@ -0,0 +1,253 @@
+import pandas as pd
+import numpy as np
+import os
+import sys
+import time
+import argparse
+import importlib
+import importlib.util
+import multiprocessing
+import tracemalloc
+from multiprocessing.connection import wait
+from testEvaluationQueue import (CASES, TEST_SUBMISSION_PATH, logger,
+        writeSubmissions, _casePath)
+
+TIMEOUT = 60 # seconds per case
+SAMPLE_CASE = "sampleSubmission" # the sample itself, which should pass
+SLOWDOWN = 2 # runtime ratio flagged by `compareReports`
+
+def readargs():
+    """Read in command line arguments.
+
+    Returns
+    -------
+    args : dict
+        contains arguments passed.
+    """
+    parser = argparse.ArgumentParser(description="Run a validation or \
+            scoring function against the test submissions of \
+            testEvaluationQueue.py locally, without submitting them.")
+    parser.add_argument("sampleSubmission", type=str, help="A .csv or .tsv file \
+            which is known to pass all test cases.")
+    parser.add_argument("validator", type=str, help="Function to run, as \
+            module:function or path/to/file.py:function. It is called with \
+            the path of each submission.")
+    parser.add_argument("--indexCols", metavar='i', help="Comma \
+            seperated list of columns required to be in submission \
+            (defaults to first column of sampleSubmission).")
+    parser.add_argument("--filetype", default="csv", help="csv or tsv")
+    parser.add_argument("--cases", help="Comma seperated list of test \
+            cases to run (defaults to all cases).")
+    parser.add_argument("--seed", type=int, default=0, help="Seed used \
+            to generate random test cases (defaults to 0).")
+    parser.add_argument("--processes", type=int, help="Number of cases \
+            to run at once (defaults to number of CPUs).")
+    parser.add_argument("--timeout", type=float, default=TIMEOUT, help="Seconds \
+            before a case is stopped (defaults to {}).".format(TIMEOUT))
+    parser.add_argument("--noMemory", action="store_true", help="Don't trace \
+            peak memory, which slows down allocation heavy validators.")
+    parser.add_argument("--reuse", action="store_true", help="Run against \
+            previously written test submissions instead of writing them again.")
+    parser.add_argument("--baseline", help="A report from a previous run to \
+            compare results and runtimes against.")
+    parser.add_argument("--outputPath", help="Path to write the .csv report to.")
+    args = parser.parse_args()
+    return args
+
+def loadCallable(spec):
+    """ Import the function `spec`, given as 'module:function' or
+    'path/to/file.py:function'. """
+    module, _, name = spec.rpartition(":")
+    if not module or not name:
+        raise ValueError("Expected module:function, got {}".format(spec))
+    if module.endswith(".py"):
+        moduleName = os.path.splitext(os.path.basename(module))[0]
+        if moduleName not in sys.modules:
+            moduleSpec = importlib.util.spec_from_file_location(moduleName, module)
+            m = importlib.util.module_from_spec(moduleSpec)
+            sys.modules[moduleName] = m
+            moduleSpec.loader.exec_module(m)
+        m = sys.modules[moduleName]
+    else:
+        m = importlib.import_module(module)
+    return getattr(m, name)
+
+def _outcome(returned):
+    """ Whether the value returned by a validator means the submission
+    passed, and why not. A validator fails a submission by raising, or by
+    returning False or a (False, message) tuple, as challenge validation
+    functions commonly do. """
+    if returned is False:
+        return "failed", None
+    if isinstance(returned, tuple) and returned and returned[0] is False:
+        return "failed", " ".join(str(r) for r in returned[1:]) or None
+    return "passed", None
+
+def _runCase(spec, path, traceMemory, conn):
+    """ Run the validator on `path` in a child process and send
+    (result, error, runtime, peak memory, returned value) to `conn`. """
+    try:
+        func = loadCallable(spec)
+        if traceMemory:
+            tracemalloc.start()
+        start = time.perf_counter()
+        returned = None
+        try:
+            returned = func(path)
+            result, error = _outcome(returned)
+        except (Exception, SystemExit) as e:
+            result, error = "failed", "{}: {}".format(type(e).__name__, e)
+        runtime = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1] if traceMemory else np.nan
+        conn.send((result, error, runtime, peak, repr(returned)[:200]))
+    finally:
+        conn.close()
+
+def runCases(validator, paths, processes=None, timeout=TIMEOUT, traceMemory=True):
+    """ Run `validator` on each of `paths`, each in its own process.
+
+    At most `processes` cases run at once. A case still running after
+    `timeout` seconds is terminated, and a case whose process dies (e.g.
+    runs out of memory) doesn't stop the others.
+
+    Arguments
+    ---------
+    validator : str
+        The function to run, as 'module:function' or
+        'path/to/file.py:function' (see `loadCallable`). It is called
+        with the path of a submission and fails it by raising or
+        returning False or (False, message).
+    paths : dict
+        Maps case names to submission files.
+    processes : int
+        Number of cases to run at once (default number of CPUs).
+    timeout : float
+        Seconds before a case is stopped (default TIMEOUT).
+    traceMemory : bool
+        Whether to trace the peak memory allocated by the validator
+        (default True).
+
+    Returns
+    -------
+    A pandas.DataFrame indexed by case with columns `result` ('passed',
+    'failed', 'timeout' or 'crashed'), `error`, `runtime` (seconds),
+    `peakMemory` (MB) and `returned`.
+    """
+    loadCallable(validator) # fail early, and only import once if forked
+    processes = processes or os.cpu_count() or 1
+    methods = multiprocessing.get_all_start_methods()
+    context = multiprocessing.get_context("fork" if "fork" in methods else None)
+    pending = list(paths.items())[::-1]
+    running = {} # connection -> (name, process, start)
+    results = {}
+    def finish(conn, row):
+        name, process, start = running.pop(conn)
+        process.join(1)
+        if process.is_alive():
+            process.kill()
+        conn.close()
+        results[name] = row
+        logger.info("[{}/{}] {}: {} ({:.2f} s)".format(len(results), len(paths),
+            name, row[0], row[2]))
+    while pending or running:
+        while pending and len(running) < processes:
+            name, path = pending.pop()
+            receiver, sender = context.Pipe(duplex=False)
+            process = context.Process(target=_runCase,
+                    args=(validator, path, traceMemory, sender), daemon=True)
+            process.start()
+            sender.close()
+            running[receiver] = (name, process, time.perf_counter())
+        nextDeadline = min(start for _, _, start in running.values()) + timeout
+        wait(list(running), timeout=max(0, nextDeadline - time.perf_counter()))
+        for conn, (name, process, start) in list(running.items()):
+            elapsed = time.perf_counter() - start
+            if conn.poll():
+                try:
+                    result, error, runtime, peak, returned = conn.recv()
+                    finish(conn, (result, error, runtime, peak / 2**20, returned))
+                except EOFError: # died before sending its result
+                    process.join(1)
+                    finish(conn, ("crashed", "Exit code {}".format(
+                        process.exitcode), elapsed, np.nan, None))
+            elif elapsed > timeout:
+                process.terminate()
+                finish(conn, ("timeout", "Stopped after {} s".format(timeout),
+                    elapsed, np.nan, None))
+    report = pd.DataFrame.from_dict(results, orient="index", columns=["result",
+        "error", "runtime", "peakMemory", "returned"])
+    report.index.name = "case"
+    return report.reindex(list(paths))
+
+def compareReports(report, baseline, slowdown=SLOWDOWN):
+    """ Cases whose result changed since `baseline`, or which are more
+    than `slowdown` times slower.
+
+    Returns
+    -------
+    A pandas.DataFrame indexed by case with the result and runtime from
+    both reports.
+    """
+    both = report[["result", "runtime"]].join(baseline[["result", "runtime"]],
+            rsuffix="Baseline", how="inner")
+    changed = (both["result"] != both["resultBaseline"]) | \
+            (both["runtime"] > slowdown * both["runtimeBaseline"])
+    return both[changed]
+
+def validateSubmissions(sampleSubmission, validator, indexCols=None,
+        filetype="csv", cases=None, seed=0, processes=None, timeout=TIMEOUT,
+        traceMemory=True, reuse=False):
+    """ Write the test submissions of `writeSubmissions` and run `validator`
+    on each of them, and on `sampleSubmission` itself as the case
+    SAMPLE_CASE, without touching Synapse.
+
+    Arguments
+    ---------
+    sampleSubmission : str
+        path to submission file that is known to pass tests.
+    validator : str
+        See `runCases`.
+    indexCols, filetype, cases, seed :
+        See `testEvaluationQueue.writeSubmissions`.
+    processes, timeout, traceMemory :
+        See `runCases`.
+    reuse : bool
+        Whether to run against previously written test submissions
+        (default False).
+
+    Returns
+    -------
+    The report of `runCases`.
+    """
+    cases = list(CASES) if cases is None else list(cases)
+    if not reuse:
+        if not os.path.exists(TEST_SUBMISSION_PATH):
+            os.makedirs(TEST_SUBMISSION_PATH)
+        writeSubmissions(sampleSubmission, indexCols, filetype, cases, seed,
+                processes)
+    paths = {SAMPLE_CASE: sampleSubmission}
+    paths.update((name, _casePath(name, filetype)) for name in cases)
+    logger.info("Running {} on {} submissions".format(validator, len(paths)))
+    return runCases(validator, paths, processes, timeout, traceMemory)
+
+def main():
+    args = readargs()
+    indexCols = None if not args.indexCols else args.indexCols.split(",")
+    cases = None if not args.cases else args.cases.split(",")
+    report = validateSubmissions(args.sampleSubmission, args.validator,
+            indexCols, args.filetype, cases, args.seed, args.processes,
+            args.timeout, not args.noMemory, args.reuse)
+    if args.outputPath:
+        report.to_csv(args.outputPath)
+    with pd.option_context("display.max_rows", None, "display.max_columns", None,
+            "display.width", 200):
+        print(report.drop(columns="returned"))
+        if args.baseline:
+            changes = compareReports(report,
+                    pd.read_csv(args.baseline, index_col="case"))
+            print("\n{} cases changed since {}".format(len(changes), args.baseline))
+            if len(changes):
+                print(changes)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,351 @@
+import synapseclient as sc
+import pandas as pd
+import numpy as np
+import argparse
+import copy
+import json
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+BATCHSIZE = 500 # the most statuses Synapse accepts in one batch
+THREADS = 4
+RETRIES = 3
+RETRY_WAIT = 1 # seconds, multiplied by the attempt
+# columns of `exportEvaluation.buildLeaderboard` which describe the
+# submission rather than annotate its status
+SUBMISSION_COLS = ['createdOn', 'entityId', 'evaluationId', 'name', 'status',
+        'submissionId', 'team', 'teamId', 'userId']
+ANNOTATION_TYPES = ['stringAnnos', 'doubleAnnos', 'longAnnos']
+
+def read_args():
+    parser = argparse.ArgumentParser(description='Write columns of a '
+            'leaderboard (as exported by exportEvaluation.py) back to the '
+            'submission statuses of an evaluation queue as annotations.')
+    parser.add_argument('evaluationId', type=int, help='ID of the evaluation queue.')
+    parser.add_argument('leaderboard', help='.csv with a submissionId column.')
+    parser.add_argument('--columns', nargs='+', help='Columns to write. '
+            'Defaults to every column which isn\'t a property of the submission.')
+    parser.add_argument('--status', action='store_true', help='Also set the '
+            'status (e.g. SCORED or INVALID) of each submission from the '
+            'status column.')
+    parser.add_argument('--public', action='store_true', help='Make new '
+            'annotations public. Existing annotations keep their visibility.')
+    parser.add_argument('--batchSize', type=int, default=BATCHSIZE,
+            help='Statuses per batch (default %d).' % BATCHSIZE)
+    parser.add_argument('--threads', type=int, default=THREADS,
+            help='Batches to send at once (default %d).' % THREADS)
+    parser.add_argument('--retries', type=int, default=RETRIES,
+            help='Times to retry a batch after an etag conflict (default %d).' % RETRIES)
+    parser.add_argument('--dryRun', action='store_true', help='Print the '
+            'changes which would be made without writing them.')
+    parser.add_argument('--outputPath', help='(optional). Path to write a '
+            '.csv report of what was written to.')
+    return parser.parse_args()
+
+class ConflictError(Exception):
+    """ A batch was rejected because the etag of one of its statuses
+    is out of date. """
+    pass
+
+class SynapseEvaluationService:
+    """ Reads and writes submission statuses on Synapse. """
+
+    def __init__(self, syn):
+        self.syn = syn
+
+    def getStatuses(self, evaluationId, submissionIds=None):
+        """ A dictionary mapping submission IDs to their current status,
+        for every submission of `evaluationId` or only `submissionIds`. """
+        if submissionIds is None:
+            return {s['id']: s for _, s in
+                    self.syn.getSubmissionBundles(evaluationId)}
+        return {i: self.syn.getSubmissionStatus(i) for i in submissionIds}
+
+    def putStatuses(self, evaluationId, statuses):
+        """ Update `statuses` in a single batch, which Synapse rejects as
+        a whole if any of their etags are out of date. """
+        body = {'statuses': statuses, 'isFirstBatch': True, 'isLastBatch': True}
+        try:
+            self.syn.restPUT("/evaluation/{}/statusBatch".format(evaluationId),
+                    json.dumps(body))
+        except Exception as e:
+            response = getattr(e, 'response', None)
+            if getattr(response, 'status_code', None) == 412:
+                raise ConflictError(str(e))
+            raise
+
+class FakeEvaluationService:
+    """ An in-memory stand-in for `SynapseEvaluationService`, for trying
+    out `writeStatuses` without touching Synapse.
+
+    Statuses get a new etag whenever they are written, batches with an
+    out of date etag are rejected as a whole with a ConflictError, and
+    every batch received is kept in `self.batches`.
+    """
+
+    def __init__(self, statuses):
+        """
+        Parameters
+        ----------
+        statuses : list
+            Submission status dictionaries, e.g. the second element of
+            each tuple returned by `syn.getSubmissionBundles`.
+        """
+        self._statuses = {}
+        for s in statuses:
+            s = copy.deepcopy(dict(s))
+            s.setdefault('etag', str(uuid.uuid4()))
+            s.setdefault('annotations', {})
+            self._statuses[s['id']] = s
+        self.batches = []
+        self._lock = threading.Lock()
+
+    def getStatuses(self, evaluationId, submissionIds=None):
+        with self._lock:
+            ids = self._statuses if submissionIds is None else submissionIds
+            return {i: copy.deepcopy(self._statuses[i]) for i in ids
+                    if i in self._statuses}
+
+    def putStatuses(self, evaluationId, statuses):
+        with self._lock:
+            self.batches.append([s['id'] for s in statuses])
+            stale = [s['id'] for s in statuses
+                    if self._statuses[s['id']]['etag'] != s['etag']]
+            if stale:
+                raise ConflictError("Out of date etags: {}".format(
+                    ", ".join(stale)))
+            for s in statuses:
+                s = copy.deepcopy(s)
+                s['etag'] = str(uuid.uuid4())
+                self._statuses[s['id']] = s
+
+    def touch(self, submissionId, annotations=None):
+        """ Change the etag (and optionally annotations, a dictionary
+        like those of `updateStatus`) of a status, as if someone else
+        had written to it. """
+        with self._lock:
+            status = self._statuses[submissionId]
+            if annotations:
+                updateStatus(status, annotations, inPlace=True)
+            status['etag'] = str(uuid.uuid4())
+
+def _annotationValue(value, current=None):
+    """ The annotation type and value to store `value` as, or None if it's
+    null. Integral floats are kept as longs if `current` is a long, since
+    a column of ranks with NaN in it is read as floats. """
+    if pd.api.types.is_scalar(value) and pd.isna(value):
+        return None
+    if isinstance(value, (bool, np.bool_)):
+        return 'stringAnnos', str(bool(value)).lower()
+    if isinstance(value, (int, np.integer)):
+        return 'longAnnos', int(value)
+    if isinstance(value, (float, np.floating)):
+        if current == 'longAnnos' and float(value).is_integer():
+            return 'longAnnos', int(value)
+        return 'doubleAnnos', float(value)
+    return 'stringAnnos', str(value)
+
+def updateStatus(status, values, statusValue=None, private=True, inPlace=False):
+    """ Set the annotations of a submission status.
+
+    Parameters
+    ----------
+    status : dict
+        A submission status.
+    values : dict
+        Annotation keys and values. Null values are left alone, and
+        the type of each annotation follows its value (see `_annotationValue`).
+    statusValue : str
+        Optional. A new status, e.g. 'SCORED'. Defaults to None
+        (leave the status alone).
+    private : bool
+        Optional. Whether new annotations are private. Defaults to True.
+    inPlace : bool
+        Optional. Whether to modify `status` rather than a copy of it.
+        Defaults to False.
+
+    Returns
+    -------
+    A tuple of (the updated status, a list of the keys which changed).
+    The status is None if nothing changed.
+    """
+    if not inPlace:
+        status = copy.deepcopy(status)
+    annotations = status.setdefault('annotations', {})
+    current = {} # key -> (type, annotation)
+    for t in ANNOTATION_TYPES:
+        for a in annotations.get(t, []):
+            current[a['key']] = (t, a)
+    changed = []
+    for key, value in values.items():
+        t, a = current.get(key, (None, None))
+        new = _annotationValue(value, t)
+        if new is None or (new[0] == t and a['value'] == new[1]):
+            continue
+        if a is not None: # replace, possibly with another type
+            annotations[t].remove(a)
+        annotations.setdefault(new[0], []).append({'key': key, 'value': new[1],
+            'isPrivate': a['isPrivate'] if a is not None else private})
+        changed.append(key)
+    if not pd.isna(statusValue) and status.get('status') != statusValue:
+        status['status'] = statusValue
+        changed.append('status')
+    return (status if changed else None), changed
+
+def diffStatuses(leaderboard, statuses, columns=None, setStatus=False,
+        private=True):
+    """ The statuses which writing `leaderboard` would change.
+
+    Parameters
+    ----------
+    leaderboard : pandas.DataFrame
+        Shaped like the output of `exportEvaluation.buildLeaderboard`,
+        with a row per submission and a `submissionId` column.
+    statuses : dict
+        Maps submission IDs to their current status.
+    columns : list
+        Optional. Columns to write as annotations. Defaults to the columns
+        not in SUBMISSION_COLS.
+    setStatus : bool
+        Optional. Whether to also set the status of each submission from
+        the `status` column. Defaults to False.
+    private : bool
+        Optional. Whether new annotations are private. Defaults to True.
+
+    Returns
+    -------
+    A tuple of (a dictionary mapping submission IDs to their updated
+    status, for those which changed, and a pandas.DataFrame report with
+    columns `submissionId`, `result` ('changed', 'unchanged' or
+    'missing', if it isn't in `statuses`) and `changed`, the keys which
+    changed).
+    """
+    if columns is None:
+        columns = [c for c in leaderboard.columns if c not in SUBMISSION_COLS]
+    ids = leaderboard['submissionId'].astype(str).values
+    records = leaderboard[columns].astype(object).to_dict('records')
+    statusValues = leaderboard['status'].values if setStatus else [None] * len(ids)
+    updates, rows = {}, []
+    for i, values, statusValue in zip(ids, records, statusValues):
+        if i not in statuses:
+            rows.append((i, 'missing', []))
+            continue
+        status, changed = updateStatus(statuses[i], values, statusValue, private)
+        if status is not None:
+            updates[i] = status
+        rows.append((i, 'changed' if changed else 'unchanged', changed))
+    report = pd.DataFrame(rows, columns=['submissionId', 'result', 'changed'])
+    return updates, report
+
+def _writeBatch(service, evaluationId, batch, leaderboard, columns, setStatus,
+        private, retries):
+    """ Write one batch of updated statuses, re-reading and re-diffing the
+    statuses in the batch after each etag conflict.
+
+    Returns
+    -------
+    A tuple of (the IDs written, the number of attempts).
+    """
+    for attempt in range(1, retries + 2):
+        try:
+            service.putStatuses(evaluationId, list(batch.values()))
+            return list(batch), attempt
+        except ConflictError:
+            if attempt > retries:
+                raise
+            time.sleep(RETRY_WAIT * attempt)
+            current = service.getStatuses(evaluationId, list(batch))
+            rows = leaderboard[leaderboard['submissionId'].astype(str).isin(list(batch))]
+            batch, _ = diffStatuses(rows, current, columns, setStatus, private)
+            if not batch: # someone else already wrote the same values
+                return [], attempt
+
+def writeStatuses(service, evaluationId, leaderboard, columns=None,
+        setStatus=False, private=True, batchSize=BATCHSIZE, threads=THREADS,
+        retries=RETRIES, dryRun=False):
+    """ Write columns of `leaderboard` to the submission statuses of an
+    evaluation queue as annotations.
+
+    The current statuses are read once and only those which would change
+    are written, in batches of `batchSize` sent by a pool of `threads`
+    threads. A batch rejected because one of its statuses was changed in
+    the meantime is re-read, re-diffed and retried up to `retries` times.
+    A batch which still fails doesn't stop the others.
+
+    Parameters
+    ----------
+    service : SynapseEvaluationService or FakeEvaluationService
+    evaluationId : int
+        ID of the evaluation queue.
+    leaderboard : pandas.DataFrame
+        See `diffStatuses`.
+    columns : list
+        Optional. See `diffStatuses`.
+    setStatus : bool
+        Optional. See `diffStatuses`. Defaults to False.
+    private : bool
+        Optional. Whether new annotations are private. Defaults to True.
+    batchSize : int
+        Optional. Defaults to BATCHSIZE.
+    threads : int
+        Optional. Defaults to THREADS.
+    retries : int
+        Optional. Defaults to RETRIES.
+    dryRun : bool
+        Optional. Whether to only diff the statuses. Defaults to False.
+
+    Returns
+    -------
+    The report of `diffStatuses`, with `result` 'written' or 'failed' for
+    the changed statuses (unless `dryRun`) and an `attempts` column.
+    """
+    statuses = service.getStatuses(evaluationId)
+    updates, report = diffStatuses(leaderboard, statuses, columns, setStatus,
+            private)
+    print("{} of {} submissions have changes{}.".format(len(updates),
+        len(report), "" if report['result'].ne('missing').all() else
+        " ({} not found in the queue)".format(report['result'].eq('missing').sum())))
+    report['attempts'] = 0
+    if dryRun or not updates:
+        return report
+    ids = list(updates)
+    batches = [{i: updates[i] for i in ids[start:start+batchSize]}
+            for start in range(0, len(ids), batchSize)]
+    results = {}
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        futures = {executor.submit(_writeBatch, service, evaluationId, b,
+            leaderboard, columns, setStatus, private, retries): b for b in batches}
+        for n, future in enumerate(as_completed(futures), 1):
+            batch = futures[future]
+            try:
+                written, attempts = future.result()
+                # statuses dropped on a retry already had the new values
+                results.update((i, ('written' if i in written else 'unchanged',
+                    attempts)) for i in batch)
+                print("[{}/{}] wrote {} statuses".format(n, len(batches), len(written)))
+            except Exception as e:
+                results.update((i, ('failed', retries + 1)) for i in batch)
+                print("[{}/{}] failed to write {} statuses ({})".format(
+                    n, len(batches), len(batch), e))
+    written = report['submissionId'].map(results)
+    sent = written.notna()
+    report.loc[sent, 'result'] = [r[0] for r in written[sent]]
+    report.loc[sent, 'attempts'] = [r[1] for r in written[sent]]
+    return report
+
+def main():
+    args = read_args()
+    leaderboard = pd.read_csv(args.leaderboard, dtype={'submissionId': str})
+    syn = sc.login()
+    report = writeStatuses(SynapseEvaluationService(syn), args.evaluationId,
+            leaderboard, args.columns, args.status, not args.public,
+            args.batchSize, args.threads, args.retries, args.dryRun)
+    if args.outputPath:
+        report.to_csv(args.outputPath, index=False)
+    else:
+        print(report.to_string(index=False))
+
+if __name__ == '__main__':
+    main()